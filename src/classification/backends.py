@@ -0,0 +1,110 @@
+import os
+import numpy as np
+import torch
+from types import SimpleNamespace
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from src.classification.configs import DEVICE
+
+
+BACKENDS = ["torch", "torch-int8", "onnx", "onnx-int8"]
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+
+
+# --- 1. export ---
+
+def export_onnx(save: str, quantize: bool = True, opset: int = 17):
+    """
+    학습된 체크포인트(save)를 ONNX로 변환
+    - 체크포인트 폴더에 저장 (load_model이 같은 폴더에서 토크나이저/ONNX를 함께 읽음)
+    - quantize=True면 가중치 int8 동적 양자화 모델도 함께 저장
+    """
+    tokenizer = AutoTokenizer.from_pretrained(save, use_fast=True)
+    model = AutoModelForSequenceClassification.from_pretrained(save).eval()
+    model.config.return_dict = False # onnx 출력은 tuple로
+
+    dummy = tokenizer(["배달이 너무 늦어요"], return_tensors="pt")
+    onnx_path = os.path.join(save, ONNX_FILE)
+
+    torch.onnx.export(
+        model,
+        (dummy["input_ids"], dummy["attention_mask"]),
+        onnx_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "seq"},
+            "attention_mask": {0: "batch", 1: "seq"},
+            "logits": {0: "batch"},
+        },
+        opset_version=opset,
+        dynamo=False,
+    )
+    print(f"ONNX 저장 완료: {onnx_path}")
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType # pip install onnxruntime
+
+        int8_path = os.path.join(save, ONNX_INT8_FILE)
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"int8 ONNX 저장 완료: {int8_path}")
+
+    return onnx_path
+
+
+# --- 2. 추론 모델 로드 ---
+
+class OnnxSequenceClassifier:
+    # predict_texts에서 torch 모델과 같은 방식으로 호출할 수 있도록 감싼 ONNX Runtime 세션
+    def __init__(self, path: str, num_threads: int = 0):
+        import onnxruntime as ort # pip install onnxruntime
+
+        opts = ort.SessionOptions()
+        if num_threads > 0:
+            opts.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        return self
+
+    def __call__(self, input_ids, attention_mask, **kwargs):
+        logits = self.session.run(
+            ["logits"],
+            {
+                "input_ids": input_ids.cpu().numpy().astype(np.int64),
+                "attention_mask": attention_mask.cpu().numpy().astype(np.int64),
+            },
+        )[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+
+def load_model(save: str, backend: str = "torch", num_threads: int = 0):
+    """
+    backend별 분류 모델 로드 (모두 .logits를 가진 출력을 리턴)
+    - torch: fp32 (DEVICE)
+    - torch-int8: nn.Linear 동적 int8 양자화 (CPU)
+    - onnx / onnx-int8: export_onnx로 저장한 모델 (CPU, ONNX Runtime, num_threads > 0이면 intra-op 스레드 수 고정)
+    """
+    if backend == "torch":
+        return AutoModelForSequenceClassification.from_pretrained(save).to(DEVICE)
+
+    if backend == "torch-int8":
+        model = AutoModelForSequenceClassification.from_pretrained(save).eval()
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    if backend in ("onnx", "onnx-int8"):
+        path = os.path.join(save, ONNX_FILE if backend == "onnx" else ONNX_INT8_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path}가 없습니다. 먼저 --mode export로 변환해 주세요.")
+        return OnnxSequenceClassifier(path, num_threads)
+
+    raise ValueError(f"지원하지 않는 backend: {backend} (지원: {BACKENDS})")
+
+
+# fp32 torch 외에는 CPU에서 실행
+def backend_device(backend: str) -> str:
+    return DEVICE if backend == "torch" else "cpu"
@@ -0,0 +1,145 @@
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.pipeline import make_pipeline
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import recall_score, precision_score
+
+from src.classification.configs import id2label
+from src.classification.utils import split_train_val_test
+
+
+CASCADE_FILE = "cascade.joblib"
+
+
+# --- 1. 1단계 모델 (TF-IDF + 로지스틱 회귀) ---
+
+def build_stage1(seed: int = 42):
+    # 한국어 리뷰는 띄어쓰기가 불규칙하므로 문자 n-gram 사용
+    return make_pipeline(
+        TfidfVectorizer(analyzer="char_wb", ngram_range=(1, 3), min_df=2, sublinear_tf=True),
+        LogisticRegression(max_iter=1000, class_weight="balanced", random_state=seed),
+    )
+
+
+def _texts(df: pd.DataFrame, text_col: str):
+    return df[text_col].fillna("").astype(str).tolist()
+
+
+def _class2_metrics(y_true, y_pred):
+    return (
+        float(recall_score(y_true, y_pred, labels=[2], average=None, zero_division=0)[0]),
+        float(precision_score(y_true, y_pred, labels=[2], average=None, zero_division=0)[0]),
+    )
+
+
+# --- 2. 캐스케이드 추론 ---
+
+def cascade_predict(df: pd.DataFrame, text_col: str, stage1: dict, bert_predict_fn, return_proba: bool = False):
+    """
+    1단계 모델의 확신도(최대 확률)가 threshold 이상이면 그대로 사용, 미만이면 bert_predict_fn(df_sub) -> 라벨로 재분류
+    - 결과는 df 행 순서대로 라벨 리스트
+    - return_proba=True면 bert_predict_fn도 확률을 리턴해야 하며, 결과는 (N, 전체 라벨 수) 확률
+      (1단계 학습 데이터에 없던 라벨의 컬럼은 0)
+    """
+    model, threshold = stage1["model"], stage1["threshold"]
+    if len(df) == 0:
+        return np.zeros((0, len(id2label))) if return_proba else []
+
+    proba = model.predict_proba(_texts(df, text_col))
+    preds = model.classes_[proba.argmax(axis=1)].astype(int)
+    escalate = proba.max(axis=1) < threshold
+
+    print(f"캐스케이드 : 1단계 확정 {int((~escalate).sum())}개 / BERT 재분류 {int(escalate.sum())}개 (threshold={threshold:.2f})")
+    if return_proba:
+        full = np.zeros((len(df), len(id2label))) # 컬럼을 라벨 순서로
+        full[:, model.classes_.astype(int)] = proba
+        proba = full
+        if escalate.any():
+            proba[escalate] = np.asarray(bert_predict_fn(df.iloc[np.flatnonzero(escalate)]), dtype=np.float64)
+        return proba
+
+    if escalate.any():
+        preds[escalate] = np.asarray(bert_predict_fn(df.iloc[np.flatnonzero(escalate)]), dtype=int)
+    return preds.tolist()
+
+
+def load_cascade(path: str) -> dict:
+    return joblib.load(path)
+
+
+# --- 3. 학습 + threshold 튜닝 ---
+
+def tune_threshold(conf, stage1_pred, bert_pred, y_true, tolerance: float = 0.0):
+    """
+    val set에서 확정(2) recall이 BERT 단독 대비 tolerance 이상 떨어지지 않는 가장 낮은 threshold 선택
+    - threshold가 낮을수록 1단계에서 끝나는 리뷰가 많아짐
+    - 조건을 만족하는 값이 없으면 전부 BERT로 보냄 (threshold > 1)
+    """
+    bert_recall, _ = _class2_metrics(y_true, bert_pred)
+
+    for t in np.round(np.arange(0.40, 1.0, 0.01), 2):
+        pred = np.where(conf >= t, stage1_pred, bert_pred)
+        recall, _ = _class2_metrics(y_true, pred)
+        if recall >= bert_recall - tolerance:
+            return float(t)
+    return 1.01
+
+
+def train_cascade(df: pd.DataFrame, text_col: str, label_col: str, seed: int, bert_predict_fn, out_path: str, tolerance: float = 0.0) -> dict:
+    """
+    train_pipeline과 같은 분할로 1단계 모델을 학습하고 val에서 threshold 튜닝 후, test에서 BERT 단독과 비교
+    """
+    train_df, val_df, test_df = split_train_val_test(df, label_col, seed)
+
+    model = build_stage1(seed)
+    model.fit(_texts(train_df, text_col), train_df[label_col].astype(int))
+
+    # threshold 튜닝 (val)
+    proba = model.predict_proba(_texts(val_df, text_col))
+    conf = proba.max(axis=1)
+    stage1_pred = model.classes_[proba.argmax(axis=1)].astype(int)
+    bert_val = np.asarray(bert_predict_fn(val_df), dtype=int)
+    threshold = tune_threshold(conf, stage1_pred, bert_val, val_df[label_col].astype(int).to_numpy(), tolerance)
+
+    stage1 = {"model": model, "threshold": threshold}
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    joblib.dump(stage1, out_path)
+    print(f"1단계 모델 저장 완료: {out_path} (threshold={threshold:.2f})")
+
+    # test 비교 (BERT 단독 vs 캐스케이드)
+    y_true = test_df[label_col].astype(int).to_numpy()
+
+    start = time.time()
+    bert_test = np.asarray(bert_predict_fn(test_df), dtype=int)
+    bert_time = time.time() - start
+
+    start = time.time()
+    cascade_test = np.asarray(cascade_predict(test_df, text_col, stage1, bert_predict_fn), dtype=int)
+    cascade_time = time.time() - start
+
+    bert_recall, bert_precision = _class2_metrics(y_true, bert_test)
+    cascade_recall, cascade_precision = _class2_metrics(y_true, cascade_test)
+    escalated = float((model.predict_proba(_texts(test_df, text_col)).max(axis=1) < threshold).mean()) if len(test_df) else 0.0
+
+    print("\n[캐스케이드 vs BERT 단독 (test)]")
+    print(f"확정 recall    : BERT={bert_recall:.4f} / 캐스케이드={cascade_recall:.4f}")
+    print(f"확정 precision : BERT={bert_precision:.4f} / 캐스케이드={cascade_precision:.4f}")
+    print(f"BERT 재분류 비율 : {escalated:.2%}")
+    print(f"소요 시간 : BERT={bert_time:.2f}s / 캐스케이드={cascade_time:.2f}s")
+
+    return {
+        "threshold": threshold,
+        "escalation_rate": escalated,
+        "bert_class2_recall": bert_recall,
+        "cascade_class2_recall": cascade_recall,
+        "bert_class2_precision": bert_precision,
+        "cascade_class2_precision": cascade_precision,
+    }
+
+
+def default_cascade_path(save: str) -> str:
+    return os.path.join(save, CASCADE_FILE)
@@ -1,52 +1,168 @@
 import os
-import pandas as pd
+import json
+import time
+from contextlib import nullcontext
+import numpy as np
 import argparse
+import torch
 
 from torch.utils.data import DataLoader
 from torch.optim import AdamW # BERT에서 거의 표준으로 사용하는 옵티마이저
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import confusion_matrix, classification_report
 from transformers import AutoTokenizer, AutoModelForSequenceClassification, BertTokenizerFast
 
 from src.classification.configs import MODEL_ID, MAX_LEN, DEVICE, EPS, id2label
-from src.classification.utils import set_seed, balanced_class_extract
-from src.classification.datasets import TrainTextDataset, InferTextDataset
-from src.classification.trainer import train_one_epoch, eval_model, predict_texts
+from src.classification.utils import set_seed, balanced_class_extract, split_train_val_test, softmax, assign_predictions
+from src.classification.datasets import (
+    TrainTextDataset, InferTextDataset, DynamicInferTextDataset, LengthBucketBatchSampler, DynamicPadCollator,
+    CachedTextDataset, build_token_cache, TeacherLogitsDataset, ResumableRandomSampler,
+)
+from src.classification.trainer import (
+    train_one_epoch, eval_model, is_improved, predict_texts, predict_logits, save_train_state, load_train_state, set_rng_state,
+)
+from src.classification.backends import BACKENDS, load_model, backend_device, export_onnx
+from src.classification.pred_cache import PredictionCache, model_fingerprint, cached_predict
+from src.classification.cascade import train_cascade, load_cascade, cascade_predict, default_cascade_path
+from src.classification.sharded import ShardedPredictor
+from src.classification.distill import build_student, count_params, make_distill_loss_fn
+from src.classification.efficient import freeze_lower_layers, count_trainable, LoRAAdapters, bf16_supported, autocast_context
+from src.classification.early_exit import EarlyExitHeads, make_exit_loss_fn, save_exit_heads, load_exit_heads, predict_early_exit
+from src.data_io import FORMATS, read_table, write_table, iter_table, infer_format
 
 
 # argparse
 def build_argparser():
     p = argparse.ArgumentParser(description="이탈의도분류")
-    p.add_argument("--input", required=True, help="입력 CSV 경로")
+    p.add_argument("--input", default=None, help="입력 데이터 경로 (csv/parquet/feather), export 모드 외 필수")
+    p.add_argument("--out", default="out.csv", help="결과 저장 경로")
+    p.add_argument("--format", default=None, choices=FORMATS, help="저장 포맷 (미입력시 --out 확장자로 판단, 기본 csv)")
     p.add_argument("--save", required=True, help="모델 파라미터 저장 경로")
     p.add_argument("--text-col", default="content", help="텍스트 컬럼명")
     p.add_argument("--label-col", default="churn_intent_label", help="라벨 컬럼명")
     p.add_argument("--n", type=int, default=-1, help="클래스 밸런싱 (-1:미사용, 0:최솟값, n:n개)") # n개로 맞출 수 없을 시 자동으로 최솟값 사용
     p.add_argument("--model", type=int, default=1, help="사용할 모델 인덱스") # ["klue/bert-base", "kykim/bert-kor-base", "kykim/albert-kor-base", "kykim/funnel-kor-base", "electra-kor-base"]
-    p.add_argument("--mode", required=True, choices=["train", "infer"], help="train/infer")
+    p.add_argument("--mode", required=True, choices=["train", "infer", "export", "cascade", "distill"], help="train/infer/export/cascade/distill")
     p.add_argument("--seed", type=int, default=42, help="랜덤시드")
     p.add_argument("--batch", type=int, default=16, help="배치사이즈")
     p.add_argument("--epochs", type=int, default=5, help="에폭수")
     p.add_argument("--lr", type=float, default=2e-5, help="학습률")
+    p.add_argument("--token-cache", default=None, help="토큰화 캐시 경로 (지정 시 train/val을 한 번만 토크나이즈해서 재사용)")
+    p.add_argument("--workers", type=int, default=0, help="DataLoader 워커 수")
+    p.add_argument("--padding", default="dynamic", choices=["dynamic", "max_length"], help="추론 패딩 방식 (dynamic: 길이순 배치 + 배치별 패딩)")
+    # 추론 backend
+    p.add_argument("--backend", default="torch", choices=BACKENDS, help="추론 backend (onnx 계열은 --mode export 먼저 실행)")
+    p.add_argument("--procs", type=int, default=1, help="CPU 추론 프로세스 수 (1보다 크면 데이터를 나눠 병렬 추론)")
+    p.add_argument("--threads", type=int, default=0, help="추론 프로세스당 스레드 수 (0: CPU 코어 수 / procs)")
+    # CPU 친화 학습 (train 모드)
+    p.add_argument("--freeze-layers", type=int, default=0, help="임베딩 + 아래쪽 N개 encoder 레이어 고정")
+    p.add_argument("--lora-rank", type=int, default=0, help="LoRA rank (0: 미사용, 지정 시 adapter와 분류 head만 학습)")
+    p.add_argument("--lora-alpha", type=float, default=16.0, help="LoRA scaling (alpha / rank)")
+    p.add_argument("--bf16", action="store_true", help="bf16 autocast 학습 (지원 환경에서만 적용)")
+    p.add_argument("--grad-accum", type=int, default=1, help="그래디언트 누적 스텝 수")
+    # early exit (train: 중간 레이어 head 함께 학습, infer: 확신도가 threshold 이상이면 중간에 종료)
+    p.add_argument("--exit-layers", type=lambda x: [int(k) for k in x.split(",")], default=None, help="중간 head를 붙일 레이어 번호 (예: 4,8)")
+    p.add_argument("--exit-weight", type=float, default=1.0, help="중간 head loss 비중")
+    p.add_argument("--exit-threshold", type=float, default=None, help="early exit 확신도 threshold (infer 모드에서 지정 시 early exit 추론)")
+    # 스트리밍 추론 (infer 모드, 결과는 csv에 청크마다 이어쓰기)
+    p.add_argument("--chunksize", type=int, default=0, help="청크 크기 (0: 전체를 한 번에 로드)")
+    p.add_argument("--resume", action="store_true", help="체크포인트 지점부터 이어서 실행 (train: 마지막 저장 상태, infer: 마지막 완료 청크)")
+    p.add_argument("--checkpoint", default=None, help="체크포인트 경로 (기본: train은 <save>/train_state/last.pt, infer는 <out>.ckpt.json)")
+    # 학습 상태 저장 / early stopping (train 모드)
+    p.add_argument("--save-every", type=int, default=0, help="에폭 중간 학습 상태 저장 주기 (배치 수, 0: 에폭마다만 저장)")
+    p.add_argument("--patience", type=int, default=0, help="개선 없는 에폭이 patience번 이어지면 학습 중단 (0: 미사용)")
+    p.add_argument("--compare", action="store_true", help="fp32 torch 결과와의 일치율/속도 비교 출력")
+    # 캐스케이드 (cascade 모드: 1단계 모델 학습, infer 모드: 1단계 모델 사용)
+    p.add_argument("--cascade", default=None, help="1단계 모델 경로 (cascade 모드 미입력시 <save>/cascade.joblib)")
+    p.add_argument("--cascade-tolerance", type=float, default=0.0, help="threshold 튜닝 시 허용할 확정 recall 하락폭")
+    p.add_argument("--cache-db", default=None, help="추론 결과 캐시 SQLite 경로 (같은 리뷰/모델은 재추론 생략)")
+    p.add_argument("--no-quantize", action="store_true", help="export 시 int8 ONNX 생성 생략")
+    # 지식 증류 (distill 모드: --save의 teacher로 student 학습)
+    p.add_argument("--student-save", default=None, help="student 저장 경로 (미입력시 <save>-student)")
+    p.add_argument("--student-layers", type=int, default=4, help="student 레이어 수")
+    p.add_argument("--student-hidden", type=int, default=None, help="student hidden size (미입력시 teacher와 동일)")
+    p.add_argument("--kd-alpha", type=float, default=0.5, help="soft target(KL) loss 비중 (나머지는 정답 라벨 CE)")
+    p.add_argument("--kd-temp", type=float, default=2.0, help="증류 온도")
     return p
 
+# 추론 (dynamic: 길이별 버킷 + 동적 패딩 후 원래 순서로 복원)
+# return_logits=True면 라벨 대신 (N, 클래스수) logits 리턴
+def predict_df(model, tokenizer, df, text_col, batch, padding="dynamic", device=DEVICE, return_logits=False):
+    predict_fn = predict_logits if return_logits else predict_texts
+    loader, restore = build_infer_loader(tokenizer, df, text_col, batch, padding)
+    return restore(predict_fn(model, loader, device))
+
+# 추론용 DataLoader와 결과를 원래 순서로 되돌리는 함수
+def build_infer_loader(tokenizer, df, text_col, batch, padding="dynamic"):
+    if padding == "dynamic":
+        dataset = DynamicInferTextDataset(df, tokenizer, text_col, MAX_LEN)
+        sampler = LengthBucketBatchSampler(dataset.lengths, batch)
+        loader = DataLoader(dataset, batch_sampler=sampler, collate_fn=DynamicPadCollator(tokenizer.pad_token_id))
+        return loader, sampler.restore
+
+    loader = DataLoader(InferTextDataset(df, tokenizer, text_col, MAX_LEN), batch_size=batch, shuffle=False)
+    return loader, lambda outputs: outputs
+
+# early exit 추론 (logits 리스트, 리뷰별 사용 레이어 수 리스트)
+def predict_df_early_exit(model, heads, tokenizer, df, text_col, batch, threshold, padding="dynamic", device=DEVICE):
+    loader, restore = build_infer_loader(tokenizer, df, text_col, batch, padding)
+    logits, layers = predict_early_exit(model, heads, loader, device, threshold)
+    logits, layers = restore(logits), restore(layers)
+    if layers:
+        print(f"early exit : 평균 사용 레이어 {np.mean(layers):.2f}/{model.config.num_hidden_layers} (threshold={threshold})")
+    return logits, layers
+
+# early exit vs 전체 레이어 추론 비교 (평균 사용 레이어, 일치율, 라벨이 있으면 정확도/확정 recall 차이)
+def compare_early_exit(model, heads, tokenizer, df, text_col, batch, threshold, label_col=None, padding="dynamic", device=DEVICE):
+    start = time.time()
+    full = np.asarray(predict_df(model, tokenizer, df, text_col, batch, padding, device))
+    full_time = time.time() - start
+
+    start = time.time()
+    logits, layers = predict_df_early_exit(model, heads, tokenizer, df, text_col, batch, threshold, padding, device)
+    exit_time = time.time() - start
+    early = np.asarray(logits).argmax(axis=1) if logits else np.zeros(0, dtype=int)
+
+    report = {
+        "avg_layers": float(np.mean(layers)) if layers else 0.0,
+        "agreement": float((full == early).mean()) if len(full) else 1.0,
+        "full_samples_per_sec": len(df) / max(full_time, 1e-9),
+        "exit_samples_per_sec": len(df) / max(exit_time, 1e-9),
+    }
+    if label_col and label_col in df.columns:
+        y_true = df[label_col].astype(int).to_numpy()
+        for name, pred in [("full", full), ("exit", early)]:
+            report[f"{name}_acc"] = float((pred == y_true).mean()) if len(y_true) else 0.0
+            report[f"{name}_class2_recall"] = float(((pred == 2) & (y_true == 2)).sum() / max(1, (y_true == 2).sum()))
+
+    print(f"\n[early exit vs 전체 레이어] threshold={threshold}")
+    print(f"평균 사용 레이어 : {report['avg_layers']:.2f}/{model.config.num_hidden_layers}")
+    print(f"전체 레이어 결과와 일치율 : {report['agreement']:.4f}")
+    if "full_acc" in report:
+        print(f"정확도 : full={report['full_acc']:.4f} / exit={report['exit_acc']:.4f} (차이 {report['exit_acc'] - report['full_acc']:+.4f})")
+        print(f"확정 recall : full={report['full_class2_recall']:.4f} / exit={report['exit_class2_recall']:.4f} (차이 {report['exit_class2_recall'] - report['full_class2_recall']:+.4f})")
+    print(f"처리 속도(samples/sec) : full={report['full_samples_per_sec']:.1f}, exit={report['exit_samples_per_sec']:.1f}")
+    return report
+
+# 모델 인덱스별 tokenizer
+def load_tokenizer(model_idx):
+    if model_idx == 2: # albert
+        return BertTokenizerFast.from_pretrained(MODEL_ID[model_idx])
+    return AutoTokenizer.from_pretrained(MODEL_ID[model_idx], use_fast=True) # use_fast=True: Rust 기반 fast tokenizer 사용, 옛날모델은 미지원.
+
 # train
-def train_pipeline(df, args):
+# splits=(train_df, val_df, test_df)를 주면 분할 생략 (sweep에서 같은 분할 공유)
+def train_pipeline(df, args, splits=None):
     set_seed(args.seed)
 
     model_id = MODEL_ID[args.model]
 
     print("모델 :", model_id)
-    print("전체 데이터 수 :", len(df))
-    print("이탈의도 클래스별 분포 :", df[args.label_col].value_counts())
+    if splits is None:
+        print("전체 데이터 수 :", len(df))
+        print("이탈의도 클래스별 분포 :", df[args.label_col].value_counts())
 
     # split
-    train_df, tmp = train_test_split(
-        df, test_size=0.2, random_state=args.seed, shuffle=True, stratify=df[args.label_col]
-    )
-    val_df, test_df = train_test_split(
-        tmp, test_size=0.5, random_state=args.seed, shuffle=True, stratify=tmp[args.label_col]
-    )
+    train_df, val_df, test_df = splits if splits is not None else split_train_val_test(df, args.label_col, args.seed)
     print(f"train/val/test : {len(train_df)}/{len(val_df)}/{len(test_df)}")
 
     # balancing (train only)
@@ -64,28 +180,97 @@ def train_pipeline(df, args):
         print("이탈의도 클래스별 분포 :", train_df[args.label_col].value_counts())
 
     # tokenizer/model
-    if args.model == 2: # albert
-        tokenizer = BertTokenizerFast.from_pretrained(model_id)
-    else:
-        tokenizer = AutoTokenizer.from_pretrained(model_id, use_fast=True) # use_fast=True: Rust 기반 fast tokenizer 사용, 옛날모델은 미지원.
+    tokenizer = load_tokenizer(args.model)
     model = AutoModelForSequenceClassification.from_pretrained(model_id, num_labels=3, use_safetensors=True).to(DEVICE) # safetensors: 가중치를 저장하는 포맷
 
     # dataloader
-    train_loader = DataLoader(
-        TrainTextDataset(train_df, tokenizer, args.text_col, args.label_col, MAX_LEN),
-        batch_size=args.batch, shuffle=True
-    )
-    val_loader = DataLoader(
-        TrainTextDataset(val_df, tokenizer, args.text_col, args.label_col, MAX_LEN),
-        batch_size=args.batch, shuffle=False
-    )
-
-    optimizer = AdamW(model.parameters(), lr=args.lr)
+    loader_kwargs = {"num_workers": args.workers, "persistent_workers": args.workers > 0}
+    if args.token_cache:
+        # 캐시된 토큰 사용 + 배치별 동적 패딩
+        train_set = CachedTextDataset(build_token_cache(train_df, tokenizer, args.text_col, args.label_col, MAX_LEN, args.token_cache, model_id))
+        val_set = CachedTextDataset(build_token_cache(val_df, tokenizer, args.text_col, args.label_col, MAX_LEN, args.token_cache, model_id))
+        loader_kwargs["collate_fn"] = DynamicPadCollator(tokenizer.pad_token_id)
+    else:
+        train_set = TrainTextDataset(train_df, tokenizer, args.text_col, args.label_col, MAX_LEN)
+        val_set = TrainTextDataset(val_df, tokenizer, args.text_col, args.label_col, MAX_LEN)
+
+    sampler = ResumableRandomSampler(len(train_set), args.seed) # 중간 체크포인트에서 같은 순서로 이어가기 위해 에폭별 시드 고정
+    train_loader = DataLoader(train_set, batch_size=args.batch, sampler=sampler, generator=torch.Generator(), **loader_kwargs) # 워커 시드용 난수가 전역 RNG를 쓰지 않도록
+    val_loader = DataLoader(val_set, batch_size=args.batch, shuffle=False, **loader_kwargs)
+
+    # CPU 친화 학습: 아래쪽 레이어 고정 또는 LoRA adapter만 학습
+    adapters = None
+    if args.lora_rank > 0:
+        adapters = LoRAAdapters(model, args.lora_rank, args.lora_alpha)
+    elif args.freeze_layers > 0:
+        freeze_lower_layers(model, args.freeze_layers)
+
+    use_bf16 = args.bf16 and bf16_supported(DEVICE)
+    if args.bf16 and not use_bf16:
+        print("bf16 미지원 환경이므로 fp32로 학습합니다.")
+
+    # early exit용 중간 레이어 head (본 head와 함께 학습)
+    exit_heads, loss_fn = None, None
+    params = list(model.parameters()) + (list(adapters.parameters()) if adapters else [])
+    if args.exit_layers:
+        exit_heads = EarlyExitHeads(args.exit_layers, model.config.hidden_size, model.config.num_labels).to(DEVICE)
+        exit_heads.hook(model)
+        loss_fn = make_exit_loss_fn(exit_heads, args.exit_weight)
+        params += list(exit_heads.parameters())
+        print(f"early exit head : 레이어 {exit_heads.exit_layers}")
+
+    trainable, total = count_trainable(params)
+    print(f"학습 파라미터 : {trainable:,}/{total:,} ({trainable / max(1, total):.1%}) | bf16={use_bf16} | 유효 배치={args.batch * args.grad_accum}")
+    optimizer = AdamW([p for p in params if p.requires_grad], lr=args.lr)
 
     best = {"recall": -1.0, "precision": -1.0, "loss": float("inf")}
+    epoch_times = []
+    start_epoch, start_step, bad_epochs, stopped = 1, 0, 0, False
+
+    # 학습 상태 체크포인트 (에폭마다 + --save-every 배치마다 저장, --resume 시 이어서 학습)
+    state_path = args.checkpoint or os.path.join(args.save, "train_state", "last.pt")
+    state = load_train_state(state_path) if args.resume else None
+    if state:
+        if state["model_id"] != model_id:
+            raise ValueError(f"체크포인트의 모델({state['model_id']})과 요청한 모델({model_id})이 다릅니다: {state_path}")
+        model.load_state_dict(state["model"])
+        optimizer.load_state_dict(state["optimizer"])
+        if adapters:
+            adapters.load_state_dict(state["adapters"])
+        if exit_heads:
+            exit_heads.load_state_dict(state["exit_heads"])
+        best, epoch_times, bad_epochs, stopped = state["best"], state["epoch_times"], state["bad_epochs"], state["stopped"]
+        start_epoch, start_step = state["epoch"], state["step"]
+        set_rng_state(state["rng"])
+        print(f"이어서 학습 : epoch {start_epoch}, {start_step}번째 배치 이후부터 (best recall={best['recall']:.4f})")
+
+    def checkpoint(epoch, step):
+        save_train_state(
+            state_path, model_id=model_id, epoch=epoch, step=step,
+            model=model.state_dict(), optimizer=optimizer.state_dict(),
+            adapters=adapters.state_dict() if adapters else None,
+            exit_heads=exit_heads.state_dict() if exit_heads else None,
+            best=dict(best), epoch_times=list(epoch_times), bad_epochs=bad_epochs, stopped=stopped,
+        )
 
-    for epoch in range(1, args.epochs + 1):
-        tr_loss = train_one_epoch(model, train_loader, optimizer, DEVICE)
+    for epoch in range(start_epoch, args.epochs + 1):
+        if stopped:
+            break
+        step0 = start_step if epoch == start_epoch else 0
+        sampler.set_epoch(epoch, step0 * args.batch)
+
+        last_saved = step0
+        def on_step(step):
+            nonlocal last_saved
+            if args.save_every and step - last_saved >= args.save_every:
+                checkpoint(epoch, step)
+                last_saved = step
+
+        start = time.time()
+        tr_loss = train_one_epoch(model, train_loader, optimizer, DEVICE, loss_fn=loss_fn,
+                                  accum_steps=args.grad_accum, autocast=autocast_context(DEVICE, use_bf16),
+                                  start_step=step0, on_step=on_step)
+        epoch_times.append(time.time() - start)
         val_metrics = eval_model(model, val_loader, DEVICE)
 
         cp = val_metrics["class2_precision"]
@@ -93,69 +278,336 @@ def train_pipeline(df, args):
         vl = val_metrics["loss"]
 
         print(
-            f"[Epoch {epoch}] train_loss={tr_loss:.4f} | "
+            f"[Epoch {epoch}] train_loss={tr_loss:.4f} train_time={epoch_times[-1]:.1f}s | "
             f"val_loss={vl:.4f} val_acc={val_metrics['acc']:.4f} val_f1={val_metrics['f1']:.4f} "
             f"val_class2_precision={cp:.4f} val_class2_recall={cr:.4f}"
         )
 
         # save best model (class2 recall)
-        improved = (
-            (cr > best["recall"] + EPS) or
-            (abs(cr - best["recall"]) <= EPS and cp > best["precision"] + EPS) or
-            (abs(cr - best["recall"]) <= EPS and abs(cp - best["precision"]) <= EPS and vl < best["loss"] - EPS)
-        )
-
-        if improved:
+        if is_improved(best, cr, cp, vl, EPS):
             best.update({"recall": cr, "precision": cp, "loss": vl})
+            bad_epochs = 0
 
             os.makedirs(args.save, exist_ok=True)
-            model.save_pretrained(args.save)
+            with adapters.merged(model) if adapters else nullcontext(): # LoRA는 원래 가중치에 합쳐서 저장
+                model.save_pretrained(args.save)
             tokenizer.save_pretrained(args.save)
+            if exit_heads:
+                save_exit_heads(exit_heads, args.save)
 
             print(f"Saved best model | recall={cr:.4f}, precision={cp:.4f}, val_loss={vl:.4f}")
+        else:
+            bad_epochs += 1
+
+        # early stopping (같은 기준으로 patience 에폭 동안 개선 없으면 중단)
+        if args.patience and bad_epochs >= args.patience:
+            stopped = True
+            print(f"Early stopping : {bad_epochs}에폭 동안 개선 없음")
+        checkpoint(epoch + 1, 0)
+
+    print(f"\n[학습 요약] 에폭당 학습 시간 평균 {np.mean(epoch_times):.1f}s (에폭별: {', '.join(f'{t:.1f}' for t in epoch_times)}) | "
+          f"best val 확정 recall={best['recall']:.4f}, precision={best['precision']:.4f}")
 
     # test with best checkpoint
     best_model = AutoModelForSequenceClassification.from_pretrained(args.save).to(DEVICE)
     best_tokenizer = AutoTokenizer.from_pretrained(args.save, use_fast=True)
 
-    test_loader = DataLoader(
-        InferTextDataset(test_df, best_tokenizer, args.text_col, MAX_LEN),
-        batch_size=args.batch, shuffle=False
-    )
-
     y_true = test_df[args.label_col]
-    y_pred = predict_texts(best_model, test_loader, DEVICE)
+    start = time.time()
+    y_pred = predict_df(best_model, best_tokenizer, test_df, args.text_col, args.batch, args.padding)
+    infer_time = time.time() - start
 
     print("\n[혼동 행렬]")
     print(confusion_matrix(y_true, y_pred))
     print("\n[분류 리포트]")
     print(classification_report(y_true, y_pred, target_names=["없음", "불만", "확정"]))
 
+    if exit_heads:
+        compare_early_exit(best_model, load_exit_heads(args.save, DEVICE), best_tokenizer, test_df, args.text_col, args.batch,
+                           args.exit_threshold or 0.9, args.label_col, args.padding)
+
+    # 결과 요약 (sweep 리더보드용)
+    test_report = classification_report(y_true, y_pred, labels=[0, 1, 2], output_dict=True, zero_division=0)
+    return {
+        "model_id": model_id,
+        "lr": args.lr,
+        "epochs": args.epochs,
+        "val_class2_recall": best["recall"],
+        "val_class2_precision": best["precision"],
+        "val_loss": best["loss"],
+        "test_acc": test_report["accuracy"],
+        "test_f1": test_report["macro avg"]["f1-score"],
+        "test_class2_recall": test_report["2"]["recall"],
+        "test_class2_precision": test_report["2"]["precision"],
+        "train_samples_per_sec": len(train_set) * len(epoch_times) / max(sum(epoch_times), 1e-9),
+        "infer_samples_per_sec": len(test_df) / max(infer_time, 1e-9),
+        "epoch_time_avg": float(np.mean(epoch_times)),
+    }
+
+# 지식 증류 (teacher: --save 체크포인트, student: 레이어/hidden을 줄인 같은 구조)
+def distill_pipeline(df, args):
+    set_seed(args.seed)
+    student_save = args.student_save or f"{args.save.rstrip('/')}-student"
+
+    # train_pipeline과 같은 분할 (teacher가 보지 않은 val/test로 평가)
+    train_df, val_df, test_df = split_train_val_test(df, args.label_col, args.seed)
+    print(f"train/val/test : {len(train_df)}/{len(val_df)}/{len(test_df)}")
+
+    tokenizer = AutoTokenizer.from_pretrained(args.save, use_fast=True)
+    teacher = AutoModelForSequenceClassification.from_pretrained(args.save).to(DEVICE)
+
+    # teacher soft logits는 학습 전에 한 번만 계산
+    print("[teacher logits 계산]")
+    teacher_logits = predict_df(teacher, tokenizer, train_df, args.text_col, args.batch, args.padding, return_logits=True)
+
+    student = build_student(args.save, args.student_layers, args.student_hidden).to(DEVICE)
+    print(f"파라미터 수 : teacher={count_params(teacher):,} / student={count_params(student):,}")
+
+    # dataloader
+    loader_kwargs = {"num_workers": args.workers, "persistent_workers": args.workers > 0}
+    if args.token_cache:
+        train_set = CachedTextDataset(build_token_cache(train_df, tokenizer, args.text_col, args.label_col, MAX_LEN, args.token_cache, args.save))
+        val_set = CachedTextDataset(build_token_cache(val_df, tokenizer, args.text_col, args.label_col, MAX_LEN, args.token_cache, args.save))
+        loader_kwargs["collate_fn"] = DynamicPadCollator(tokenizer.pad_token_id)
+    else:
+        train_set = TrainTextDataset(train_df, tokenizer, args.text_col, args.label_col, MAX_LEN)
+        val_set = TrainTextDataset(val_df, tokenizer, args.text_col, args.label_col, MAX_LEN)
+
+    train_loader = DataLoader(TeacherLogitsDataset(train_set, teacher_logits), batch_size=args.batch, shuffle=True, **loader_kwargs)
+    val_loader = DataLoader(val_set, batch_size=args.batch, shuffle=False, **loader_kwargs)
+
+    optimizer = AdamW(student.parameters(), lr=args.lr)
+    loss_fn = make_distill_loss_fn(args.kd_alpha, args.kd_temp)
+
+    best = {"recall": -1.0, "precision": -1.0, "loss": float("inf")}
+
+    for epoch in range(1, args.epochs + 1):
+        tr_loss = train_one_epoch(student, train_loader, optimizer, DEVICE, loss_fn=loss_fn)
+        val_metrics = eval_model(student, val_loader, DEVICE)
+
+        cp = val_metrics["class2_precision"]
+        cr = val_metrics["class2_recall"]
+        vl = val_metrics["loss"]
+
+        print(
+            f"[Epoch {epoch}] distill_loss={tr_loss:.4f} | "
+            f"val_loss={vl:.4f} val_acc={val_metrics['acc']:.4f} val_f1={val_metrics['f1']:.4f} "
+            f"val_class2_precision={cp:.4f} val_class2_recall={cr:.4f}"
+        )
+
+        # save best student (class2 recall)
+        if is_improved(best, cr, cp, vl, EPS):
+            best.update({"recall": cr, "precision": cp, "loss": vl})
+
+            os.makedirs(student_save, exist_ok=True)
+            student.save_pretrained(student_save)
+            tokenizer.save_pretrained(student_save)
+
+            print(f"Saved best student | recall={cr:.4f}, precision={cp:.4f}, val_loss={vl:.4f}")
+
+    # test: teacher vs best student (확정 recall/precision, 처리 속도)
+    best_student = AutoModelForSequenceClassification.from_pretrained(student_save).to(DEVICE)
+    y_true = test_df[args.label_col].astype(int).to_numpy()
+    report = {}
+
+    for name, model in [("teacher", teacher), ("student", best_student)]:
+        start = time.time()
+        y_pred = np.asarray(predict_df(model, tokenizer, test_df, args.text_col, args.batch, args.padding))
+        elapsed = time.time() - start
+
+        tp = int(((y_pred == 2) & (y_true == 2)).sum())
+        report[name] = {
+            "class2_recall": tp / max(1, int((y_true == 2).sum())),
+            "class2_precision": tp / max(1, int((y_pred == 2).sum())),
+            "samples_per_sec": len(test_df) / max(elapsed, 1e-9),
+        }
+
+        print(f"\n[{name} 혼동 행렬]")
+        print(confusion_matrix(y_true, y_pred, labels=[0, 1, 2]))
+
+    print("\n[teacher vs student (test)]")
+    for key in ["class2_recall", "class2_precision", "samples_per_sec"]:
+        print(f"{key} : teacher={report['teacher'][key]:.4f} / student={report['student'][key]:.4f}")
+    print(f"속도 향상 : {report['student']['samples_per_sec'] / max(report['teacher']['samples_per_sec'], 1e-9):.2f}x")
+    return report
+
 # inference
-def infer_pipeline(df, save, text_col, batch):
-    
+# df -> 클래스별 확률 (N, 클래스수) 함수와 정리 함수 리턴 (모델은 한 번만 로드해서 여러 번 호출 가능)
+# procs > 1이면 CPU 멀티프로세스로 나눠서 추론 (워커당 threads개 스레드, 0이면 코어 수 / procs)
+# exit_threshold 지정 시 early exit 추론 (torch backend, 단일 프로세스)
+def make_label_predictor(save, text_col, batch, padding="dynamic", backend="torch", cache_db=None, cascade=None, procs=1, threads=0, exit_threshold=None):
+
+    if exit_threshold is not None:
+        if backend != "torch" or procs > 1:
+            raise ValueError("early exit는 torch backend 단일 프로세스 추론만 지원합니다.")
+        tokenizer = AutoTokenizer.from_pretrained(save, use_fast=True)
+        model = load_model(save, backend)
+        heads = load_exit_heads(save, DEVICE)
+        model_logits = lambda x: predict_df_early_exit(model, heads, tokenizer, x, text_col, batch, exit_threshold, padding)[0]
+        close = lambda: None
+    elif procs > 1:
+        sharded = ShardedPredictor(save, backend, procs, threads)
+        model_logits = lambda x: sharded.predict(x, text_col, batch, padding, return_logits=True)
+        close = sharded.close
+    else:
+        tokenizer = AutoTokenizer.from_pretrained(save, use_fast=True)
+        model = load_model(save, backend)
+        model_logits = lambda x: predict_df(model, tokenizer, x, text_col, batch, padding, backend_device(backend), return_logits=True)
+        close = lambda: None
+
+    def predict_proba(d):
+        if cache_db:
+            # 캐시에 없는 리뷰만 모델 추론
+            return softmax(cached_predict(d, text_col, model_logits, PredictionCache(cache_db), model_fingerprint(save, backend, exit_threshold), return_logits=True))
+        return softmax(model_logits(d))
+
+    stage1 = load_cascade(cascade) if cascade else None
+
+    def predict(d):
+        if stage1:
+            # 1단계 모델이 확신하지 못한 리뷰만 BERT로
+            return cascade_predict(d, text_col, stage1, predict_proba, return_proba=True)
+        return predict_proba(d)
+
+    return predict, close
+
+def infer_pipeline(df, save, text_col, batch, padding="dynamic", backend="torch", cache_db=None, cascade=None, procs=1, threads=0, exit_threshold=None):
+    predict, close = make_label_predictor(save, text_col, batch, padding, backend, cache_db, cascade, procs, threads, exit_threshold)
+    try:
+        probs = predict(df)
+    finally:
+        close()
+
+    return assign_predictions(df, probs)
+
+# 스트리밍 추론 체크포인트 (완료한 청크 수 + 그 시점의 출력 파일 크기)
+def save_stream_checkpoint(path, input_path, chunksize, chunks, rows, out_bytes):
+    state = {"input": os.path.abspath(input_path), "chunksize": chunksize, "chunks": chunks, "rows": rows, "out_bytes": out_bytes}
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path) # 쓰는 도중 중단되어도 기존 체크포인트는 유지
+
+def load_stream_checkpoint(path, input_path, chunksize):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    if state["input"] != os.path.abspath(input_path) or state["chunksize"] != chunksize:
+        raise ValueError(f"체크포인트의 입력/청크 크기({state['input']}, {state['chunksize']})가 요청과 다릅니다: {path}")
+    return state
+
+# 청크 단위 추론 (청크마다 out csv에 이어쓰기, resume=True면 마지막으로 완료한 청크 다음부터)
+def stream_infer_pipeline(input_path, out, chunksize, save, text_col, batch, padding="dynamic", backend="torch",
+                          cache_db=None, cascade=None, procs=1, threads=0, resume=False, checkpoint=None, exit_threshold=None):
+    checkpoint = checkpoint or f"{out}.ckpt.json"
+    state = load_stream_checkpoint(checkpoint, input_path, chunksize) if resume else None
+
+    # 결과 파일이 없거나 체크포인트 기록보다 짧으면 이어쓸 수 없으므로 처음부터 다시 추론
+    if state and (not os.path.exists(out) or os.path.getsize(out) < state["out_bytes"]):
+        print(f"결과 파일({out})이 없거나 체크포인트({state['out_bytes']} bytes)보다 짧아서 처음부터 다시 추론합니다.")
+        state = None
+
+    if state:
+        # 체크포인트 이후에 쓰다 만 행은 잘라냄
+        with open(out, "r+b") as f:
+            f.truncate(state["out_bytes"])
+        done, rows = state["chunks"], state["rows"]
+        print(f"이어서 추론 : 완료된 청크 {done}개 ({rows}행) 이후부터")
+    else:
+        if os.path.exists(out):
+            os.remove(out)
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        done, rows = 0, 0
+
+    predict, close = make_label_predictor(save, text_col, batch, padding, backend, cache_db, cascade, procs, threads, exit_threshold)
+    try:
+        for i, chunk in enumerate(iter_table(input_path, chunksize)):
+            if i < done:
+                continue
+
+            chunk = assign_predictions(chunk, predict(chunk))
+
+            header = not os.path.exists(out) or os.path.getsize(out) == 0
+            chunk.to_csv(out, mode="a", header=header, index=True, encoding="utf-8-sig" if header else "utf-8", escapechar='\\')
+
+            rows += len(chunk)
+            save_stream_checkpoint(checkpoint, input_path, chunksize, i + 1, rows, os.path.getsize(out))
+            print(f"[청크 {i + 1}] 누적 {rows}행 저장")
+    finally:
+        close()
+
+    return rows
+
+# backend별 결과를 fp32 torch와 비교 (일치율, 처리 속도)
+def compare_backends(df, save, text_col, batch, backend, padding="dynamic"):
     tokenizer = AutoTokenizer.from_pretrained(save, use_fast=True)
-    model = AutoModelForSequenceClassification.from_pretrained(save).to(DEVICE)
+    report = {}
+    preds = {}
 
-    loader = DataLoader(InferTextDataset(df, tokenizer, text_col, MAX_LEN), batch_size=batch, shuffle=False)
-    preds = predict_texts(model, loader, DEVICE)
-    df['churn_intent'] = [id2label[p] for p in preds]
-    df['churn_intent_label'] = preds
+    for name in ["torch", backend]:
+        model = load_model(save, name)
+        start = time.time()
+        preds[name] = np.array(predict_df(model, tokenizer, df, text_col, batch, padding, backend_device(name)))
+        elapsed = time.time() - start
+        report[f"{name}_samples_per_sec"] = len(df) / max(elapsed, 1e-9)
+
+    base, other = preds["torch"], preds[backend]
+    report["agreement"] = float((base == other).mean()) if len(base) else 1.0
+    for c, name in id2label.items():
+        mask = base == c
+        report[f"agreement_{name}"] = float((other[mask] == c).mean()) if mask.any() else float("nan")
 
-    return df
+    print(f"\n[backend 비교] torch vs {backend}")
+    print(f"전체 일치율 : {report['agreement']:.4f}")
+    print("클래스별 일치율 : " + ", ".join(f"{name}={report[f'agreement_{name}']:.4f}" for name in id2label.values()))
+    print(f"처리 속도(samples/sec) : torch={report['torch_samples_per_sec']:.1f}, {backend}={report[f'{backend}_samples_per_sec']:.1f}")
+    return report
 
 
 def main():
     os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
-    args = build_argparser().parse_args()
-    df = pd.read_csv(input, encoding="utf-8-sig")
+    p = build_argparser()
+    args = p.parse_args()
+
+    if args.mode == "export":
+        export_onnx(args.save, quantize=not args.no_quantize)
+        return
+    if not args.input:
+        p.error("--input은 export 외 모드에서 필수입니다.")
+
+    if args.mode == "infer" and (args.chunksize > 0 or args.resume):
+        if args.format not in (None, "csv") or infer_format(args.out) != "csv":
+            p.error("--chunksize/--resume은 csv 저장만 지원합니다.")
+        if args.chunksize <= 0:
+            p.error("--resume은 --chunksize와 함께 사용해야 합니다.")
+        stream_infer_pipeline(args.input, args.out, args.chunksize, args.save, args.text_col, args.batch, args.padding, args.backend,
+                              args.cache_db, args.cascade, args.procs, args.threads, args.resume, args.checkpoint, args.exit_threshold)
+        return
+
+    df = read_table(args.input)
 
     if args.mode == "train":
         train_pipeline(df, args)
+    elif args.mode == "distill":
+        distill_pipeline(df, args)
+        return
+    elif args.mode == "cascade":
+        tokenizer = AutoTokenizer.from_pretrained(args.save, use_fast=True)
+        model = load_model(args.save, args.backend)
+        bert_predict_fn = lambda d: predict_df(model, tokenizer, d, args.text_col, args.batch, args.padding, backend_device(args.backend))
+        train_cascade(df, args.text_col, args.label_col, args.seed, bert_predict_fn,
+                      args.cascade or default_cascade_path(args.save), args.cascade_tolerance)
+        return
     else:
-        df = infer_pipeline(df, args.save, args.text_col, args.batch)
-
-    df.to_csv('out.csv', encoding='utf-8-sig', escapechar='\\')
+        if args.compare and args.exit_threshold is not None:
+            compare_early_exit(load_model(args.save), load_exit_heads(args.save, DEVICE), AutoTokenizer.from_pretrained(args.save, use_fast=True),
+                               df, args.text_col, args.batch, args.exit_threshold, args.label_col, args.padding)
+        elif args.compare and args.backend != "torch":
+            compare_backends(df, args.save, args.text_col, args.batch, args.backend, args.padding)
+        df = infer_pipeline(df, args.save, args.text_col, args.batch, args.padding, args.backend, args.cache_db, args.cascade, args.procs, args.threads, args.exit_threshold)
+
+    write_table(df, args.out, args.format, index=True, escapechar='\\')
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -7,3 +7,4 @@ DEVICE = "cuda" if torch.cuda.is_available() else "cpu" # gpu를 위한 코드
 EPS = 1e-6
 
 id2label = {0: "없음", 1: "불만", 2: "확정"}
+PROB_COLS = [f"prob_{i}" for i in id2label] # 클래스별 확률 컬럼 (threshold 재조정용)
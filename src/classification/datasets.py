@@ -1,6 +1,11 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
 import pandas as pd
 import torch
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, Sampler
 
 
 class TrainTextDataset(Dataset):
@@ -56,3 +61,178 @@ class InferTextDataset(Dataset):
             "input_ids": enc["input_ids"].squeeze(0), # (1, MAX_LEN) -> (MAX_LEN,)
             "attention_mask": enc["attention_mask"].squeeze(0), # (1, MAX_LEN) -> (MAX_LEN,)
         }
+
+
+class DynamicInferTextDataset(Dataset):
+    # 전체 텍스트를 한 번에 토크나이즈 (패딩은 배치 단위로 collate에서)
+    def __init__(self, df: pd.DataFrame, tokenizer, text_col: str, max_len: int):
+        texts = df[text_col].tolist()
+        enc = tokenizer(texts, truncation=True, max_length=max_len, padding=False)
+
+        self.input_ids = enc["input_ids"]
+        self.lengths = [len(ids) for ids in self.input_ids]
+
+    def __len__(self):
+        return len(self.input_ids)
+
+    def __getitem__(self, idx: int):
+        return {"input_ids": self.input_ids[idx]}
+
+
+class LengthBucketBatchSampler(Sampler):
+    # 길이순으로 정렬해 비슷한 길이끼리 배치 구성 -> 패딩 최소화
+    def __init__(self, lengths, batch_size: int):
+        self.order = np.argsort(lengths, kind="stable")
+        self.batches = [self.order[i:i + batch_size].tolist() for i in range(0, len(self.order), batch_size)]
+
+    def __iter__(self):
+        return iter(self.batches)
+
+    def __len__(self):
+        return len(self.batches)
+
+    # 정렬된 순서의 결과를 원래 순서로 복원
+    def restore(self, outputs):
+        restored = [None] * len(outputs)
+        for pos, idx in enumerate(self.order):
+            restored[idx] = outputs[pos]
+        return restored
+
+
+class ResumableRandomSampler(Sampler):
+    # 에폭마다 (seed + epoch)로 섞은 순서를 만들고, start번째 샘플부터 이어서 (중간 체크포인트 재개용)
+    def __init__(self, num_samples: int, seed: int = 42):
+        self.num_samples = num_samples
+        self.seed = seed
+        self.epoch = 0
+        self.start = 0
+
+    def set_epoch(self, epoch: int, start: int = 0):
+        self.epoch = epoch
+        self.start = start
+
+    def __iter__(self):
+        g = torch.Generator()
+        g.manual_seed(self.seed + self.epoch)
+        return iter(torch.randperm(self.num_samples, generator=g).tolist()[self.start:])
+
+    def __len__(self):
+        return self.num_samples - self.start
+
+
+class DynamicPadCollator:
+    # 배치 내 최대 길이로만 패딩
+    def __init__(self, pad_token_id: int):
+        self.pad_token_id = pad_token_id
+
+    def __call__(self, items):
+        max_len = max(len(item["input_ids"]) for item in items)
+        input_ids = torch.full((len(items), max_len), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(items), max_len), dtype=torch.long)
+
+        for i, item in enumerate(items):
+            ids = item["input_ids"]
+            input_ids[i, :len(ids)] = torch.as_tensor(ids, dtype=torch.long)
+            attention_mask[i, :len(ids)] = 1
+
+        batch = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "labels" in items[0]:
+            batch["labels"] = torch.tensor([item["labels"] for item in items], dtype=torch.long)
+        if "teacher_logits" in items[0]:
+            batch["teacher_logits"] = torch.stack([torch.as_tensor(item["teacher_logits"], dtype=torch.float) for item in items])
+        return batch
+
+
+# --- 토큰화 캐시 (memmap) ---
+
+def token_cache_key(df: pd.DataFrame, text_col: str, label_col: str, model_id: str, max_len: int) -> str:
+    data_hash = hashlib.sha1(
+        pd.util.hash_pandas_object(df[[text_col, label_col]].astype(str), index=False).values.tobytes()
+    ).hexdigest()
+    return hashlib.sha1(f"{model_id}|{max_len}|{data_hash}".encode()).hexdigest()[:16]
+
+
+def build_token_cache(df: pd.DataFrame, tokenizer, text_col: str, label_col: str, max_len: int, cache_root: str, model_id: str) -> str:
+    """
+    (model_id, max_len, 데이터 해시) 기준으로 한 번만 토크나이즈해서 .npy로 저장
+    - 이미 있으면 그대로 재사용
+    - 임시 폴더에 저장한 뒤 이름을 바꿔서 공개 (저장 도중 중단되거나 여러 프로세스가 동시에 만들어도 안전)
+    """
+    cache_dir = os.path.join(cache_root, token_cache_key(df, text_col, label_col, model_id, max_len))
+    if os.path.exists(os.path.join(cache_dir, "meta.json")):
+        return cache_dir
+
+    tmp_dir = f"{cache_dir}.tmp{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    enc = tokenizer(
+        df[text_col].tolist(),
+        truncation=True,
+        padding="max_length",
+        max_length=max_len,
+        return_attention_mask=True,
+    )
+    input_ids = np.asarray(enc["input_ids"], dtype=np.int32)
+    attention_mask = np.asarray(enc["attention_mask"], dtype=np.int8)
+
+    np.save(os.path.join(tmp_dir, "input_ids.npy"), input_ids)
+    np.save(os.path.join(tmp_dir, "attention_mask.npy"), attention_mask)
+    np.save(os.path.join(tmp_dir, "lengths.npy"), attention_mask.sum(axis=1).astype(np.int32))
+    np.save(os.path.join(tmp_dir, "labels.npy"), df[label_col].astype(int).to_numpy(dtype=np.int64))
+
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"model_id": model_id, "max_len": max_len, "rows": len(df)}, f)
+
+    if os.path.isdir(cache_dir) and not os.path.exists(os.path.join(cache_dir, "meta.json")):
+        shutil.rmtree(cache_dir, ignore_errors=True) # 이전 방식에서 중단된 캐시
+    try:
+        os.rename(tmp_dir, cache_dir)
+    except OSError: # 다른 프로세스가 먼저 생성
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return cache_dir
+
+
+class CachedTextDataset(Dataset):
+    # build_token_cache로 저장한 배열을 memmap으로 읽음 (DynamicPadCollator와 함께 사용)
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.lengths = np.load(os.path.join(cache_dir, "lengths.npy"))
+        self.arrays = None # 워커 프로세스마다 따로 열도록 지연 로드
+
+    def _load(self):
+        if self.arrays is None:
+            self.arrays = {
+                k: np.load(os.path.join(self.cache_dir, f"{k}.npy"), mmap_mode="r")
+                for k in ["input_ids", "labels"]
+            }
+        return self.arrays
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, idx: int):
+        arrays = self._load()
+        n = int(self.lengths[idx])
+
+        return {
+            "input_ids": np.array(arrays["input_ids"][idx, :n]), # 실제 길이만큼만 (패딩은 collate에서)
+            "labels": int(arrays["labels"][idx]),
+        }
+
+
+# --- 지식 증류 ---
+
+class TeacherLogitsDataset(Dataset):
+    # 학습 데이터셋(TrainTextDataset/CachedTextDataset) 샘플에 teacher logits 추가
+    def __init__(self, base: Dataset, teacher_logits):
+        if len(base) != len(teacher_logits):
+            raise ValueError(f"데이터 수({len(base)})와 teacher logits 수({len(teacher_logits)})가 다릅니다.")
+        self.base = base
+        self.teacher_logits = torch.as_tensor(np.asarray(teacher_logits, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.base)
+
+    def __getitem__(self, idx: int):
+        item = dict(self.base[idx])
+        item["teacher_logits"] = self.teacher_logits[idx]
+        return item
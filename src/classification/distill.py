@@ -0,0 +1,79 @@
+import re
+import numpy as np
+import torch.nn.functional as F
+from transformers import AutoConfig, AutoModelForSequenceClassification
+
+
+LAYER_KEY = re.compile(r"\.layer\.(\d+)\.")
+
+
+# --- 1. student 모델 ---
+
+def select_teacher_layers(teacher_layers: int, student_layers: int) -> list:
+    # teacher 레이어 중 균등 간격으로 student_layers개 선택 (마지막 레이어 포함)
+    if student_layers <= 1:
+        return [teacher_layers - 1]
+    return [int(round(x)) for x in np.linspace(0, teacher_layers - 1, student_layers)]
+
+
+def build_student(teacher_save: str, num_layers: int = 4, hidden_size: int | None = None):
+    """
+    teacher 체크포인트의 config에서 레이어 수(와 hidden size)만 줄인 student 생성
+    - hidden size가 같으면 임베딩/분류기 + 균등 간격으로 고른 teacher 레이어 가중치로 초기화
+    - hidden size를 줄이면 shape이 맞지 않으므로 랜덤 초기화 (증류 에폭을 늘려야 함)
+    """
+    config = AutoConfig.from_pretrained(teacher_save)
+    if getattr(config, "block_sizes", None) is not None: # funnel은 블록 구조라 레이어 수만 줄일 수 없음
+        raise ValueError(f"{config.model_type} 모델은 student 생성을 지원하지 않습니다.")
+
+    teacher_layers = config.num_hidden_layers
+    config.num_hidden_layers = num_layers
+    if hidden_size and hidden_size != config.hidden_size:
+        config.hidden_size = hidden_size
+        config.intermediate_size = hidden_size * 4
+        config.num_attention_heads = max(1, hidden_size // 64)
+
+    student = AutoModelForSequenceClassification.from_config(config)
+
+    teacher_state = AutoModelForSequenceClassification.from_pretrained(teacher_save).state_dict()
+    layer_map = {str(s): str(t) for s, t in enumerate(select_teacher_layers(teacher_layers, num_layers))}
+
+    student_state = student.state_dict()
+    copied = 0
+    for key, value in student_state.items():
+        src_key = LAYER_KEY.sub(lambda m: f".layer.{layer_map.get(m.group(1), m.group(1))}.", key)
+        src = teacher_state.get(src_key)
+        if src is not None and src.shape == value.shape:
+            student_state[key] = src.clone()
+            copied += 1
+    student.load_state_dict(student_state)
+
+    print(f"student : layers {teacher_layers} -> {num_layers}, hidden {config.hidden_size} | teacher 가중치 초기화 {copied}/{len(student_state)}개")
+    return student
+
+
+def count_params(model) -> int:
+    return sum(p.numel() for p in model.parameters())
+
+
+# --- 2. 증류 loss ---
+
+def distill_loss(student_logits, teacher_logits, labels, alpha: float = 0.5, temperature: float = 2.0):
+    """
+    alpha * KL(teacher || student, 온도 T) * T^2 + (1 - alpha) * CE(정답 라벨)
+    - T^2: 온도로 작아진 soft target gradient 크기 보정
+    """
+    soft = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=-1),
+        F.softmax(teacher_logits / temperature, dim=-1),
+        reduction="batchmean",
+    ) * (temperature ** 2)
+    hard = F.cross_entropy(student_logits, labels)
+    return alpha * soft + (1 - alpha) * hard
+
+
+# train_one_epoch의 loss_fn 형태로 변환
+def make_distill_loss_fn(alpha: float = 0.5, temperature: float = 2.0):
+    def loss_fn(outputs, batch):
+        return distill_loss(outputs.logits, batch["teacher_logits"], batch["labels"], alpha, temperature)
+    return loss_fn
@@ -0,0 +1,148 @@
+import os
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from tqdm import tqdm
+
+
+EXIT_HEADS_FILE = "exit_heads.pt"
+
+
+# --- 1. 중간 레이어 분류기 ---
+
+def encoder_layers(model):
+    # BERT/ELECTRA 계열만 지원 (레이어를 하나씩 실행할 수 있어야 함)
+    base = model.base_model
+    layers = getattr(getattr(base, "encoder", None), "layer", None)
+    if layers is None:
+        raise ValueError(f"{model.config.model_type} 모델은 early exit를 지원하지 않습니다. (BERT/ELECTRA 계열만 지원)")
+    return base, layers
+
+
+class ExitHead(nn.Module):
+    # [CLS] hidden -> dense + tanh -> 클래스 logits (BERT pooler + classifier와 같은 구조)
+    def __init__(self, hidden_size: int, num_labels: int, dropout: float = 0.1):
+        super().__init__()
+        self.dense = nn.Linear(hidden_size, hidden_size)
+        self.dropout = nn.Dropout(dropout)
+        self.out = nn.Linear(hidden_size, num_labels)
+
+    def forward(self, hidden):
+        x = torch.tanh(self.dense(hidden[:, 0]))
+        return self.out(self.dropout(x))
+
+
+class EarlyExitHeads(nn.Module):
+    """
+    exit_layers(1부터 시작하는 레이어 번호)마다 ExitHead 부착
+    - hook(model): 학습 중 해당 레이어 출력을 captured에 저장 (본 모델 forward는 그대로 사용)
+    """
+    def __init__(self, exit_layers, hidden_size: int, num_labels: int):
+        super().__init__()
+        self.exit_layers = sorted(int(k) for k in exit_layers)
+        self.hidden_size = hidden_size
+        self.num_labels = num_labels
+        self.heads = nn.ModuleDict({str(k): ExitHead(hidden_size, num_labels) for k in self.exit_layers})
+        self.captured = {}
+
+    def forward(self, layer: int, hidden):
+        return self.heads[str(layer)](hidden)
+
+    def hook(self, model):
+        _, layers = encoder_layers(model)
+        handles = []
+        for k in self.exit_layers:
+            if not 1 <= k < len(layers):
+                raise ValueError(f"exit 레이어는 1~{len(layers) - 1} 사이여야 합니다: {k}")
+
+            def capture(module, inputs, output, k=k):
+                self.captured[k] = output[0] if isinstance(output, tuple) else output
+            handles.append(layers[k - 1].register_forward_hook(capture))
+        return handles
+
+
+# 본 head loss + 중간 head loss 평균 * weight (train_one_epoch의 loss_fn 형태)
+def make_exit_loss_fn(heads: EarlyExitHeads, weight: float = 1.0):
+    def loss_fn(outputs, batch):
+        aux = [F.cross_entropy(heads(k, heads.captured[k]), batch["labels"]) for k in heads.exit_layers]
+        return outputs.loss + weight * torch.stack(aux).mean()
+    return loss_fn
+
+
+def save_exit_heads(heads: EarlyExitHeads, save: str):
+    os.makedirs(save, exist_ok=True)
+    torch.save(
+        {"exit_layers": heads.exit_layers, "hidden_size": heads.hidden_size, "num_labels": heads.num_labels, "state_dict": heads.state_dict()},
+        os.path.join(save, EXIT_HEADS_FILE),
+    )
+
+
+def load_exit_heads(save: str, device="cpu") -> EarlyExitHeads:
+    path = os.path.join(save, EXIT_HEADS_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path}가 없습니다. --exit-layers를 지정해서 학습한 체크포인트가 필요합니다.")
+
+    state = torch.load(path, map_location="cpu")
+    heads = EarlyExitHeads(state["exit_layers"], state["hidden_size"], state["num_labels"])
+    heads.load_state_dict(state["state_dict"])
+    return heads.to(device).eval()
+
+
+# --- 2. early exit 추론 ---
+
+def _final_logits(model, base, hidden):
+    # 마지막 레이어 이후는 모델의 본 head 사용 (BERT: pooler + classifier, ELECTRA: classifier)
+    if getattr(base, "pooler", None) is not None:
+        return model.classifier(model.dropout(base.pooler(hidden)))
+    return model.classifier(hidden)
+
+
+@torch.no_grad()
+def predict_early_exit(model, heads: EarlyExitHeads, loader, device, threshold: float = 0.9):
+    """
+    레이어를 하나씩 실행하다가 exit 레이어에서 최대 확률이 threshold 이상인 리뷰는 그 자리에서 종료
+    - 남은 리뷰만 다음 레이어로 (배치가 점점 작아짐)
+    - 리턴: (logits 리스트, 리뷰별 사용한 레이어 수 리스트)
+    """
+    model.eval()
+    heads.eval()
+    base, layers = encoder_layers(model)
+    exits = set(heads.exit_layers)
+
+    out_logits, out_layers = [], []
+    for batch in tqdm(loader, desc="Predict(early exit)", leave=True):
+        input_ids = batch["input_ids"].to(device)
+        attention_mask = batch["attention_mask"].to(device)
+        n = input_ids.size(0)
+
+        logits = torch.zeros((n, heads.num_labels), device=device)
+        used = torch.full((n,), len(layers), dtype=torch.long)
+        alive = torch.arange(n, device=device) # 아직 종료하지 않은 행
+
+        hidden = base.embeddings(input_ids=input_ids)
+        if getattr(base, "embeddings_project", None) is not None: # ELECTRA (embedding_size != hidden_size)
+            hidden = base.embeddings_project(hidden)
+        mask = (1.0 - attention_mask[:, None, None, :].to(hidden.dtype)) * torch.finfo(hidden.dtype).min
+
+        for k, layer in enumerate(layers, start=1):
+            out = layer(hidden, attention_mask=mask)
+            hidden = out[0] if isinstance(out, tuple) else out
+
+            if k in exits:
+                exit_logits = heads(k, hidden)
+                done = F.softmax(exit_logits, dim=-1).max(dim=-1).values >= threshold
+                if done.any():
+                    logits[alive[done]] = exit_logits[done]
+                    used[alive[done].cpu()] = k
+                    keep = ~done
+                    alive, hidden, mask = alive[keep], hidden[keep], mask[keep]
+                    if alive.numel() == 0:
+                        break
+
+        if alive.numel() > 0:
+            logits[alive] = _final_logits(model, base, hidden)
+
+        out_logits.extend(logits.float().cpu().numpy().tolist())
+        out_layers.extend(used.tolist())
+
+    return out_logits, out_layers
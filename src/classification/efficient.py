@@ -0,0 +1,103 @@
+import math
+from contextlib import contextmanager, nullcontext
+
+import torch
+import torch.nn as nn
+
+from src.classification.early_exit import encoder_layers
+
+
+HEAD_PARAM_KEYS = ("classifier", "pooler") # LoRA 학습 시에도 학습하는 분류 head
+
+
+# --- 1. 레이어 고정 ---
+
+def freeze_lower_layers(model, num_layers: int):
+    # 임베딩 + 아래쪽 num_layers개 encoder 레이어 고정 (위쪽 레이어/분류 head만 학습)
+    base, layers = encoder_layers(model)
+    num_layers = min(num_layers, len(layers))
+
+    for p in base.embeddings.parameters():
+        p.requires_grad = False
+    for layer in layers[:num_layers]:
+        for p in layer.parameters():
+            p.requires_grad = False
+    print(f"레이어 고정 : 임베딩 + encoder {num_layers}/{len(layers)}개")
+
+
+def count_trainable(params) -> tuple:
+    params = list(params)
+    return sum(p.numel() for p in params if p.requires_grad), sum(p.numel() for p in params)
+
+
+# --- 2. LoRA ---
+
+class LoRAAdapters(nn.Module):
+    """
+    attention query/value Linear에 저랭크 adapter(B @ A) 추가, 나머지 가중치는 고정
+    - forward hook으로 출력에 x @ A^T @ B^T * (alpha / r)를 더하므로 모델 구조/state_dict는 그대로
+    - merged(model): 저장할 때만 adapter를 원래 가중치에 합쳐서 일반 체크포인트로 저장
+    """
+    def __init__(self, model, rank: int = 8, alpha: float = 16.0, targets=("query", "value")):
+        super().__init__()
+        encoder_layers(model) # 지원 모델 확인
+        self.scale = alpha / rank
+        self.merging = False
+        self.linears = {}
+        self.lora_A = nn.ParameterDict()
+        self.lora_B = nn.ParameterDict()
+
+        for name, module in model.base_model.encoder.named_modules():
+            if isinstance(module, nn.Linear) and name.split(".")[-1] in targets:
+                key = name.replace(".", "_")
+                a = nn.Parameter(torch.empty(rank, module.in_features, device=module.weight.device))
+                nn.init.kaiming_uniform_(a, a=math.sqrt(5))
+                self.lora_A[key] = a
+                self.lora_B[key] = nn.Parameter(torch.zeros(module.out_features, rank, device=module.weight.device)) # 처음엔 원래 모델과 동일
+                self.linears[key] = module
+                module.register_forward_hook(self._hook(key))
+
+        for name, p in model.named_parameters():
+            p.requires_grad = any(k in name for k in HEAD_PARAM_KEYS)
+        print(f"LoRA : rank={rank}, alpha={alpha}, 대상 Linear {len(self.linears)}개")
+
+    def _hook(self, key):
+        def hook(module, inputs, output):
+            if self.merging:
+                return output
+            return output + (inputs[0] @ self.lora_A[key].t() @ self.lora_B[key].t()) * self.scale
+        return hook
+
+    def delta(self, key):
+        return (self.lora_B[key] @ self.lora_A[key]) * self.scale
+
+    @contextmanager
+    def merged(self, model):
+        originals = {}
+        with torch.no_grad():
+            for key, linear in self.linears.items():
+                originals[key] = linear.weight.detach().clone()
+                linear.weight.add_(self.delta(key).to(linear.weight.dtype))
+        self.merging = True
+        try:
+            yield model
+        finally:
+            self.merging = False
+            with torch.no_grad():
+                for key, linear in self.linears.items():
+                    linear.weight.copy_(originals[key])
+
+
+# --- 3. bf16 autocast ---
+
+def bf16_supported(device) -> bool:
+    if str(device).startswith("cuda"):
+        return torch.cuda.is_bf16_supported()
+    # CPU는 AVX512(또는 AMX) 이상에서만 bf16 연산이 fp32보다 빠름
+    return any(k in torch.backends.cpu.get_cpu_capability() for k in ("AVX512", "AMX"))
+
+
+def autocast_context(device, enabled: bool):
+    if not enabled:
+        return nullcontext()
+    return torch.autocast(device_type="cuda" if str(device).startswith("cuda") else "cpu", dtype=torch.bfloat16)
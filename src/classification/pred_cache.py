@@ -0,0 +1,129 @@
+import os
+import json
+import sqlite3
+import hashlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.text_hash import content_hash
+from src.classification.backends import ONNX_FILE, ONNX_INT8_FILE
+from src.classification.early_exit import EXIT_HEADS_FILE
+
+
+CACHE_TABLE = "pred_cache"
+SQLITE_MAX_VARS = 900 # IN (...) 절 하나에 넣을 최대 개수
+
+
+def backend_files(backend: str) -> tuple:
+    # backend별로 load_model이 실제로 읽는 가중치 파일 (onnx export 결과가 torch 캐시를 무효화하지 않도록)
+    if backend in ("onnx", "onnx-int8"):
+        return (ONNX_FILE if backend == "onnx" else ONNX_INT8_FILE,)
+    return (".safetensors", ".bin")
+
+
+def model_fingerprint(save: str, backend: str = "torch", exit_threshold: float | None = None) -> str:
+    """
+    체크포인트 지문: config.json 내용 + backend가 읽는 가중치 파일 이름/크기/수정시각 + backend
+    - 같은 경로에 재학습 모델이 저장되면 지문이 바뀌어 캐시가 자동으로 무효화됨
+    - early exit 추론이면 threshold + exit_heads.pt도 포함 (전체 깊이 결과/다른 threshold 결과와 섞이지 않도록)
+    """
+    h = hashlib.sha1(backend.encode())
+    weights = backend_files(backend)
+    if exit_threshold is not None:
+        h.update(f"exit|{float(exit_threshold)!r}".encode())
+        weights += (EXIT_HEADS_FILE,)
+    for name in sorted(os.listdir(save)):
+        path = os.path.join(save, name)
+        if name == "config.json":
+            with open(path, "rb") as f:
+                h.update(f.read())
+        elif name.endswith(weights):
+            st = os.stat(path)
+            h.update(f"{name}|{st.st_size}|{st.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+
+class PredictionCache:
+    # (content_hash, model_fp) -> label, logits 저장
+    def __init__(self, db_path: str, table: str = CACHE_TABLE):
+        self.db_path = db_path
+        self.table = table
+
+        conn = sqlite3.connect(db_path)
+        try:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    content_hash TEXT NOT NULL,
+                    model_fp TEXT NOT NULL,
+                    label INTEGER NOT NULL,
+                    logits TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    PRIMARY KEY (content_hash, model_fp)
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_many(self, hashes, model_fp: str) -> dict:
+        hashes = list(hashes)
+        found = {}
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for i in range(0, len(hashes), SQLITE_MAX_VARS):
+                chunk = hashes[i:i + SQLITE_MAX_VARS]
+                placeholders = ",".join(["?"] * len(chunk))
+                rows = conn.execute(
+                    f"SELECT content_hash, label, logits FROM {self.table} WHERE model_fp = ? AND content_hash IN ({placeholders})",
+                    (model_fp, *chunk),
+                ).fetchall()
+                for h, label, logits in rows:
+                    found[h] = (int(label), json.loads(logits))
+        finally:
+            conn.close()
+        return found
+
+    def put_many(self, hashes, model_fp: str, logits):
+        now = datetime.now().isoformat(timespec="seconds")
+        rows = [
+            (h, model_fp, int(np.argmax(lg)), json.dumps([float(x) for x in lg]), now)
+            for h, lg in zip(hashes, logits)
+        ]
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.executemany(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?, ?)", rows)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def cached_predict(df: pd.DataFrame, text_col: str, predict_fn, cache: PredictionCache, model_fp: str, return_logits: bool = False):
+    """
+    캐시를 먼저 조회하고, 없는 리뷰(내용 기준 중복 제거)만 predict_fn(df_miss) -> logits로 추론
+    - 결과는 df 행 순서대로 라벨 리스트 (return_logits=True면 logits 리스트)
+    """
+    hashes = df[text_col].map(content_hash).tolist()
+    found = cache.get_many(set(hashes), model_fp)
+
+    miss_idx = {}
+    for i, h in enumerate(hashes):
+        if h not in found and h not in miss_idx:
+            miss_idx[h] = i
+
+    n_hit = sum(h in found for h in hashes)
+    print(f"추론 캐시 : {n_hit}개 적중 / 신규 추론 {len(miss_idx)}개")
+
+    if miss_idx:
+        df_miss = df.iloc[list(miss_idx.values())]
+        miss_logits = predict_fn(df_miss)
+        cache.put_many(miss_idx.keys(), model_fp, miss_logits)
+        for h, lg in zip(miss_idx.keys(), miss_logits):
+            found[h] = (int(np.argmax(lg)), list(lg))
+
+    if return_logits:
+        return [found[h][1] for h in hashes]
+    return [found[h][0] for h in hashes]
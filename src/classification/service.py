@@ -0,0 +1,207 @@
+import json
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import request as urlrequest
+
+import torch
+from transformers import AutoTokenizer
+
+from src.classification.configs import MAX_LEN, id2label
+from src.classification.backends import BACKENDS, load_model, backend_device
+from src.classification.classifier import predict_df
+from src.classification.pred_cache import PredictionCache, model_fingerprint, cached_predict
+from src.classification.utils import softmax, assign_predictions
+
+
+# --- 1. 분류 서비스 (모델 1회 로드 + 마이크로배칭) ---
+
+class ClassifierService:
+    """
+    모델을 한 번만 로드해두고 여러 호출에서 재사용
+    - predict(texts): 동시에 들어온 요청을 max_batch개 또는 max_wait_ms까지 모아 한 번에 추론
+    - classify_df(df): 대량 데이터는 큐를 거치지 않고 길이별 배치로 바로 추론
+    """
+    def __init__(self, save: str, backend: str = "torch", max_batch: int = 32, max_wait_ms: float = 10.0):
+        self.save = save
+        self.backend = backend
+        self.device = backend_device(backend)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+
+        self.tokenizer = AutoTokenizer.from_pretrained(save, use_fast=True)
+        self.model = load_model(save, backend)
+        self.model.eval()
+        self.model_lock = threading.Lock() # 모델 호출은 한 번에 하나씩
+
+        self.queue = queue.Queue()
+        self.closed = False
+        self.state_lock = threading.Lock() # closed 확인과 큐 등록을 close()와 겹치지 않게
+        self.worker = threading.Thread(target=self._loop, daemon=True)
+        self.worker.start()
+
+    # 큐에서 요청을 모아 배치 추론
+    def _loop(self):
+        while not self.closed:
+            try:
+                first = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            items = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(items) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                preds = self._predict_batch([text for text, _ in items])
+                for (_, fut), p in zip(items, preds):
+                    fut.set_result(p)
+            except Exception as e:
+                for _, fut in items:
+                    fut.set_exception(e)
+
+    @torch.no_grad()
+    def _predict_batch(self, texts):
+        enc = self.tokenizer(texts, truncation=True, max_length=MAX_LEN, padding=True, return_tensors="pt")
+        with self.model_lock:
+            out = self.model(
+                enc["input_ids"].to(self.device),
+                attention_mask=enc["attention_mask"].to(self.device),
+            )
+        return torch.argmax(out.logits, dim=-1).cpu().tolist()
+
+    def predict(self, texts):
+        futures = []
+        with self.state_lock:
+            if self.closed:
+                raise RuntimeError("이미 종료된 서비스입니다.")
+            for t in texts:
+                fut = Future()
+                self.queue.put(("" if t is None else str(t), fut))
+                futures.append(fut)
+        return [fut.result() for fut in futures]
+
+    def classify_df(self, df, text_col: str, batch: int = 16, padding: str = "dynamic", cache_db: str | None = None):
+        with self.model_lock:
+            predict_fn = lambda d: predict_df(self.model, self.tokenizer, d, text_col, batch, padding, self.device, return_logits=True)
+            if cache_db:
+                logits = cached_predict(df, text_col, predict_fn, PredictionCache(cache_db), model_fingerprint(self.save, self.backend), return_logits=True)
+            else:
+                logits = predict_fn(df)
+        return assign_predictions(df, softmax(logits)) # 클래스별 확률도 함께 저장
+
+    def close(self):
+        with self.state_lock:
+            self.closed = True
+        self.worker.join(timeout=1)
+
+        # 처리되지 못한 요청은 오류로 끝내서 fut.result()에서 대기 중인 호출이 멈추지 않도록
+        while True:
+            try:
+                _, fut = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            fut.set_exception(RuntimeError("서비스가 종료되어 처리되지 않은 요청입니다."))
+
+
+_SERVICES = {}
+_SERVICES_LOCK = threading.Lock()
+
+# 프로세스 내 싱글턴 (같은 모델/backend는 한 번만 로드)
+def get_service(save: str, backend: str = "torch", **kwargs) -> ClassifierService:
+    key = (save, backend)
+    with _SERVICES_LOCK:
+        if key not in _SERVICES:
+            _SERVICES[key] = ClassifierService(save, backend, **kwargs)
+        return _SERVICES[key]
+
+
+# --- 2. HTTP 서버 / 클라이언트 ---
+
+def make_handler(service: ClassifierService):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, body: dict):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok", "model": service.save, "backend": service.backend})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/classify":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                texts = body["texts"]
+            except Exception as e:
+                self._send(400, {"error": f"잘못된 요청: {e}"})
+                return
+            # 문자열 하나를 넘기면 글자 단위로 분류되므로 문자열 리스트만 허용
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                self._send(400, {"error": "잘못된 요청: texts는 문자열 리스트여야 합니다."})
+                return
+
+            try:
+                preds = service.predict(texts)
+            except Exception as e:
+                self._send(500, {"error": f"분류 실패: {e}"})
+                return
+            self._send(200, {"churn_intent_label": preds, "churn_intent": [id2label[p] for p in preds]})
+
+        def log_message(self, format, *args): # 요청마다 로그 출력 생략
+            pass
+
+    return Handler
+
+
+def classify_remote(texts, url: str = "http://127.0.0.1:8000", timeout: float = 60.0):
+    req = urlrequest.Request(
+        f"{url.rstrip('/')}/classify",
+        data=json.dumps({"texts": list(texts)}, ensure_ascii=False).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urlrequest.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read())["churn_intent_label"]
+
+
+def main():
+    p = argparse.ArgumentParser(description="이탈의도분류 서비스 (HTTP)")
+    p.add_argument("--save", required=True, help="모델 경로")
+    p.add_argument("--backend", default="torch", choices=BACKENDS, help="추론 backend")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--max-batch", type=int, default=32, help="마이크로배치 최대 크기")
+    p.add_argument("--max-wait-ms", type=float, default=10.0, help="배치를 모으는 최대 대기 시간(ms)")
+    args = p.parse_args()
+
+    service = get_service(args.save, args.backend, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"분류 서비스 시작: http://{args.host}:{args.port} (POST /classify, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == "__main__":
+    main()
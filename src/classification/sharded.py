@@ -0,0 +1,75 @@
+import os
+import numpy as np
+import pandas as pd
+import torch
+import torch.multiprocessing as mp
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from src.classification.backends import load_model
+
+
+# 워커 프로세스별 전역 상태 (initializer에서 한 번만 로드)
+_WORKER = {}
+
+
+def _init_worker(save: str, backend: str, threads: int, shared_model):
+    torch.set_num_threads(threads) # 워커끼리 코어를 나눠 쓰도록 intra-op 스레드 고정
+    torch.set_num_interop_threads(1)
+
+    _WORKER["tokenizer"] = AutoTokenizer.from_pretrained(save, use_fast=True)
+    # fp32 torch는 부모 프로세스의 공유 메모리 가중치를 그대로 사용, 나머지는 워커마다 로드
+    _WORKER["model"] = shared_model if shared_model is not None else load_model(save, backend, num_threads=threads)
+    _WORKER["model"].eval()
+
+
+def _predict_shard(task):
+    from src.classification.classifier import predict_df # classifier가 이 모듈을 import하므로 순환 import 방지
+
+    shard, text_col, batch, padding, return_logits = task
+    if len(shard) == 0:
+        return []
+    return predict_df(_WORKER["model"], _WORKER["tokenizer"], shard, text_col, batch, padding, "cpu", return_logits)
+
+
+class ShardedPredictor:
+    """
+    CPU 멀티프로세스 추론
+    - df를 procs개 연속 구간으로 나눠 워커별로 추론 후 원래 순서대로 합침
+    - 워커는 threads개 intra-op 스레드 사용 (기본: CPU 코어 수 / procs)
+    - 풀은 한 번 띄워서 여러 번 predict에 재사용 (with 문 또는 close())
+    """
+    def __init__(self, save: str, backend: str = "torch", procs: int = 2, threads: int = 0):
+        self.procs = max(1, procs)
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.procs)
+
+        shared_model = None
+        if backend == "torch":
+            shared_model = AutoModelForSequenceClassification.from_pretrained(save).eval()
+            shared_model.share_memory()
+
+        # fork 후 torch 스레드풀 교착을 피하기 위해 spawn 사용
+        ctx = mp.get_context("spawn")
+        self.pool = ctx.Pool(self.procs, initializer=_init_worker, initargs=(save, backend, self.threads, shared_model))
+        print(f"샤딩 추론 : 프로세스 {self.procs}개 x 스레드 {self.threads}개 (backend={backend})")
+
+    def predict(self, df: pd.DataFrame, text_col: str, batch: int = 16, padding: str = "dynamic", return_logits: bool = False):
+        bounds = np.linspace(0, len(df), self.procs + 1).astype(int)
+        tasks = [
+            (df[[text_col]].iloc[start:end], text_col, batch, padding, return_logits)
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+
+        out = []
+        for part in self.pool.map(_predict_shard, tasks): # map은 입력 순서대로 결과 리턴
+            out.extend(part)
+        return out
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,155 @@
+import os
+import argparse
+import traceback
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+
+import pandas as pd
+
+from src.classification.configs import MODEL_ID, MAX_LEN
+from src.classification.utils import split_train_val_test
+from src.data_io import read_table, write_table
+
+
+SPLITS = ["train", "val", "test"]
+SORT_KEYS = ["val_class2_recall", "val_class2_precision", "infer_samples_per_sec"] # 선택은 val 기준 (test 지표는 보고용)
+
+
+# --- 1. 공유 분할 / 토큰 캐시 ---
+
+def prepare_splits(df: pd.DataFrame, label_col: str, seed: int, out_dir: str) -> dict:
+    # 한 번만 분할해서 parquet로 저장 (이미 있으면 재사용)
+    split_dir = os.path.join(out_dir, "splits")
+    paths = {name: os.path.join(split_dir, f"{name}_seed{seed}.parquet") for name in SPLITS}
+    if all(os.path.exists(p) for p in paths.values()):
+        print(f"저장된 분할 재사용: {split_dir}")
+        return paths
+
+    for name, part in zip(SPLITS, split_train_val_test(df, label_col, seed)):
+        write_table(part, paths[name])
+    print(f"분할 저장 완료: {split_dir}")
+    return paths
+
+
+def load_splits(paths: dict):
+    return tuple(read_table(paths[name]) for name in SPLITS)
+
+
+def prebuild_token_caches(models, paths: dict, text_col: str, label_col: str, cache_root: str):
+    # 여러 프로세스가 같은 캐시를 동시에 만들지 않도록 실행 전에 backbone별로 한 번씩 생성
+    from src.classification.classifier import load_tokenizer
+    from src.classification.datasets import build_token_cache
+
+    train_df, val_df, _ = load_splits(paths)
+    for k in models:
+        tokenizer = load_tokenizer(k)
+        for part in (train_df, val_df):
+            build_token_cache(part, tokenizer, text_col, label_col, MAX_LEN, cache_root, MODEL_ID[k])
+        print(f"토큰 캐시 준비 완료: {MODEL_ID[k]}")
+
+
+# --- 2. 실행 ---
+
+def run_one(run: dict, paths: dict, threads: int):
+    # 워커 프로세스에서 train_pipeline 1회 실행
+    import torch
+    from src.classification.classifier import build_argparser, train_pipeline
+
+    if threads > 0:
+        torch.set_num_threads(threads)
+
+    argv = [
+        "--mode", "train", "--save", run["save"], "--model", str(run["model"]),
+        "--lr", str(run["lr"]), "--epochs", str(run["epochs"]), *run["extra"],
+    ]
+    args = build_argparser().parse_args(argv)
+    try:
+        result = train_pipeline(None, args, splits=load_splits(paths))
+        return {**run, **result, "status": "ok"}
+    except Exception as e:
+        traceback.print_exc()
+        return {**run, "model_id": MODEL_ID[run["model"]], "status": f"error: {e}"}
+
+
+def sweep(df: pd.DataFrame, models, lrs, epochs_grid, out_dir: str, procs: int = 1, threads: int = 0,
+          label_col: str = "churn_intent_label", text_col: str = "content", seed: int = 42, extra=None) -> pd.DataFrame:
+    """
+    backbone x lr x epochs 조합을 procs개 프로세스로 병렬 학습하고 리더보드 리턴
+    - 분할은 한 번만 만들어 모든 실행이 공유, 토큰 캐시도 backbone별로 한 번만 생성
+    - 모델은 <out_dir>/runs/<backbone>_lr<lr>_ep<epochs>에 저장
+    - 순위는 val 확정 recall/precision 기준, test 지표는 선택에 쓰지 않고 함께 보고만 함
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = prepare_splits(df, label_col, seed, out_dir)
+    cache_root = os.path.join(out_dir, "token_cache")
+    prebuild_token_caches(models, paths, text_col, label_col, cache_root)
+
+    extra = list(extra or []) + ["--token-cache", cache_root, "--seed", str(seed), "--text-col", text_col, "--label-col", label_col]
+    runs = [
+        {
+            "model": k, "lr": lr, "epochs": ep, "extra": extra,
+            "save": os.path.join(out_dir, "runs", f"{MODEL_ID[k].replace('/', '_')}_lr{lr:g}_ep{ep}"),
+        }
+        for k, lr, ep in product(models, lrs, epochs_grid)
+    ]
+    threads = threads or max(1, (os.cpu_count() or 1) // max(1, procs))
+    print(f"sweep : {len(runs)}개 실행 (프로세스 {procs}개 x 스레드 {threads}개)")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=procs, mp_context=mp.get_context("spawn")) as ex:
+        futures = [ex.submit(run_one, run, paths, threads) for run in runs]
+        for fut in as_completed(futures):
+            r = fut.result()
+            results.append(r)
+            print(f"[{len(results)}/{len(runs)}] {r['model_id']} lr={r['lr']:g} epochs={r['epochs']} : {r['status']}")
+
+    board = pd.DataFrame(results).drop(columns=["extra"])
+    board = board.reindex(columns=[*board.columns, *(k for k in SORT_KEYS if k not in board.columns)]) # 전부 실패해도 정렬 가능하도록
+    ok = board["status"] == "ok"
+    board = pd.concat([
+        board[ok].sort_values(SORT_KEYS, ascending=False),
+        board[~ok],
+    ]).reset_index(drop=True)
+    return board
+
+
+def main():
+    p = argparse.ArgumentParser(description="backbone/하이퍼파라미터 sweep")
+    p.add_argument("--input", required=True, help="학습 데이터 경로 (csv/parquet/feather)")
+    p.add_argument("--out-dir", default="model_out/sweep", help="분할/토큰 캐시/모델/리더보드 저장 경로")
+    p.add_argument("--models", default=",".join(str(i) for i in range(len(MODEL_ID))), help="MODEL_ID 인덱스 (예: 0,1,4)")
+    p.add_argument("--lrs", default="2e-5", help="학습률 후보 (예: 2e-5,3e-5)")
+    p.add_argument("--epochs-grid", default="5", help="에폭수 후보 (예: 3,5)")
+    p.add_argument("--procs", type=int, default=1, help="동시에 학습할 프로세스 수")
+    p.add_argument("--threads", type=int, default=0, help="프로세스당 torch 스레드 수 (0: CPU 코어 수 / procs)")
+    p.add_argument("--batch", type=int, default=16, help="배치사이즈")
+    p.add_argument("--seed", type=int, default=42, help="랜덤시드")
+    p.add_argument("--text-col", default="content", help="텍스트 컬럼명")
+    p.add_argument("--label-col", default="churn_intent_label", help="라벨 컬럼명")
+    p.add_argument("--leaderboard", default=None, help="리더보드 저장 경로 (기본: <out-dir>/leaderboard.csv)")
+    args, extra = p.parse_known_args() # 나머지 인자(--bf16, --lora-rank 등)는 classifier train 모드로 그대로 전달
+
+    board = sweep(
+        read_table(args.input),
+        models=[int(x) for x in args.models.split(",")],
+        lrs=[float(x) for x in args.lrs.split(",")],
+        epochs_grid=[int(x) for x in args.epochs_grid.split(",")],
+        out_dir=args.out_dir,
+        procs=args.procs,
+        threads=args.threads,
+        label_col=args.label_col,
+        text_col=args.text_col,
+        seed=args.seed,
+        extra=["--batch", str(args.batch), *extra],
+    )
+
+    out = args.leaderboard or os.path.join(args.out_dir, "leaderboard.csv")
+    write_table(board, out)
+    print("\n[리더보드]")
+    cols = ["model_id", "lr", "epochs", *SORT_KEYS, "test_class2_recall", "test_class2_precision", "test_acc", "test_f1", "train_samples_per_sec", "status"]
+    print(board[[c for c in cols if c in board.columns]].to_string(index=False))
+    print(f"\n저장 완료: {out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,7 @@
+import os
+import random
+from contextlib import nullcontext
+
 import numpy as np
 import torch
 from tqdm import tqdm
@@ -5,24 +9,37 @@ from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_sc
 
 
 # train
-def train_one_epoch(model, loader, optimizer, device):
+# loss_fn(outputs, batch) 지정 시 outputs.loss 대신 사용 (예: 지식 증류)
+# accum_steps: 그래디언트 누적 스텝 수 (유효 배치 = 배치사이즈 * accum_steps)
+# autocast: forward/loss 계산에 사용할 컨텍스트 (예: bf16 autocast)
+# start_step: 이미 학습한 배치 수 (중간 체크포인트에서 재개 시), on_step(step): optimizer.step 직후 호출
+def train_one_epoch(model, loader, optimizer, device, loss_fn=None, accum_steps=1, autocast=None, start_step=0, on_step=None):
     model.train()
     total_loss = 0.0
+    optimizer.zero_grad()
+    last_step = start_step + len(loader)
 
-    for batch in tqdm(loader, desc="Train", leave=True):
+    for step, batch in enumerate(tqdm(loader, desc="Train", leave=True), start=start_step + 1):
         input_ids = batch['input_ids'].to(device)
         attention_mask = batch['attention_mask'].to(device)
         labels = batch['labels'].to(device)
 
-        optimizer.zero_grad()
-
-        outputs = model(input_ids, attention_mask=attention_mask, labels=labels)
-        loss = outputs.loss
-        loss.backward()
-        optimizer.step()
+        with autocast or nullcontext():
+            outputs = model(input_ids, attention_mask=attention_mask, labels=labels)
+            if loss_fn is None:
+                loss = outputs.loss
+            else:
+                loss = loss_fn(outputs, {k: v.to(device) for k, v in batch.items()})
+        (loss / accum_steps).backward()
 
         total_loss += loss.item()
 
+        if step % accum_steps == 0 or step == last_step: # 마지막 남은 스텝도 반영
+            optimizer.step()
+            optimizer.zero_grad()
+            if on_step:
+                on_step(step)
+
     return total_loss / max(1, len(loader)) # 0으로 나누는 거 방지
 
 # eval
@@ -69,6 +86,40 @@ def eval_model(model, loader, device):
     )[0]
     return {"loss": avg_loss, "acc": acc, "f1": f1, "class2_precision": float(class2_precision), "class2_recall": float(class2_recall)}
 
+# --- 학습 상태 체크포인트 (모델/옵티마이저/RNG/에폭/베스트 지표) ---
+
+def rng_state():
+    state = {"python": random.getstate(), "numpy": np.random.get_state(), "torch": torch.get_rng_state()}
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+def set_rng_state(state):
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+
+def save_train_state(path, **state):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    torch.save({**state, "rng": rng_state()}, tmp)
+    os.replace(tmp, path) # 쓰는 도중 중단되어도 기존 체크포인트는 유지
+
+def load_train_state(path):
+    if not os.path.exists(path):
+        return None
+    return torch.load(path, map_location="cpu", weights_only=False)
+
+# 베스트 모델 판단: 확정 recall -> 확정 precision -> val loss 순으로 비교
+def is_improved(best, recall, precision, loss, eps):
+    return (
+        (recall > best["recall"] + eps) or
+        (abs(recall - best["recall"]) <= eps and precision > best["precision"] + eps) or
+        (abs(recall - best["recall"]) <= eps and abs(precision - best["precision"]) <= eps and loss < best["loss"] - eps)
+    )
+
 # predict
 @torch.no_grad()
 def predict_texts(model, loader, device):
@@ -84,4 +135,18 @@ def predict_texts(model, loader, device):
 
         y_pred.extend(preds.detach().cpu().numpy().tolist())
 
-    return y_pred
\ No newline at end of file
+    return y_pred
+
+# predict (클래스별 logits)
+@torch.no_grad()
+def predict_logits(model, loader, device):
+    model.eval()
+    out_logits = []
+
+    for batch in tqdm(loader, desc="Predict", leave=True):
+        batch = {k: v.to(device) for k, v in batch.items() if k in ['input_ids', 'attention_mask']}
+        out = model(**batch)
+
+        out_logits.extend(out.logits.detach().float().cpu().numpy().tolist())
+
+    return out_logits
\ No newline at end of file
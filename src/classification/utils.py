@@ -2,6 +2,9 @@ import random
 import numpy as np
 import pandas as pd
 import torch
+from sklearn.model_selection import train_test_split
+
+from src.classification.configs import id2label, PROB_COLS
 
 
 # 전역 시드 설정
@@ -20,4 +23,34 @@ def balanced_class_extract(df: pd.DataFrame, label: str, num: int, seed: int | N
           .apply(lambda g: g.sample(n=num, random_state=seed), include_groups=False)
     )
 
-    return balanced.sample(frac=1, random_state=seed).reset_index(drop=True) # 결과들을 다시 섞은 후 0부터 인덱스 정렬
\ No newline at end of file
+    return balanced.sample(frac=1, random_state=seed).reset_index(drop=True) # 결과들을 다시 섞은 후 0부터 인덱스 정렬
+
+
+# train/val/test 분할 (8:1:1, 라벨 비율 유지)
+def split_train_val_test(df: pd.DataFrame, label: str, seed: int = 42):
+    train_df, tmp = train_test_split(
+        df, test_size=0.2, random_state=seed, shuffle=True, stratify=df[label]
+    )
+    val_df, test_df = train_test_split(
+        tmp, test_size=0.5, random_state=seed, shuffle=True, stratify=tmp[label]
+    )
+    return train_df, val_df, test_df
+
+
+# logits -> 클래스별 확률 (N, 클래스수)
+def softmax(logits) -> np.ndarray:
+    x = np.asarray(logits, dtype=np.float64).reshape(-1, len(id2label))
+    x = np.exp(x - x.max(axis=1, keepdims=True))
+    return x / x.sum(axis=1, keepdims=True)
+
+
+# 확률로 라벨/라벨명/클래스별 확률 컬럼 저장 (라벨은 확률 argmax)
+def assign_predictions(df: pd.DataFrame, probs) -> pd.DataFrame:
+    probs = np.asarray(probs, dtype=np.float64).reshape(-1, len(id2label))
+    preds = probs.argmax(axis=1).tolist()
+
+    df['churn_intent'] = [id2label[p] for p in preds]
+    df['churn_intent_label'] = preds
+    for i, col in enumerate(PROB_COLS):
+        df[col] = probs[:, i]
+    return df
@@ -3,11 +3,11 @@ import json
 import pandas as pd
 import sqlite3
 from src.data_collect import collect_reviews_by_date
-from src.classification.classifier import infer_pipeline
+from src.classification.service import get_service
 from src.keyword.llm_keyword_async import extract_keywords
 from src.risk_summary.risk_score_calc import risk_score_calc
 from src.risk_summary.llm_summary_reviews import summary_pipeline
-from src.dashboard.util import fetch_month_df, delete_month_df
+from src.dashboard.util import fetch_month_df, delete_month_df, fetch_watermark, parse_keywords
 from datetime import datetime, timedelta
 import asyncio
 import argparse
@@ -16,6 +16,7 @@ import argparse
 # --- 1. 상수 선언 및 기타 함수 ---
 DB_PATH = "demo.db"
 APP_ID = "com.sampleapp"
+MODEL_DIR = "model_out/bert-kor-base"
 DATE_COL = "at"
 TODAY = datetime(2026, 2, 1)
 
@@ -27,8 +28,25 @@ def safe_json_dumps(x):
         return x
     return json.dumps([], ensure_ascii=False) # 나머지는 빈 리스트로  
 
+# 기존 테이블에 없는 컬럼 추가 (예: 클래스별 확률 컬럼이 생기기 전에 만든 DB)
+def add_missing_columns(df:pd.DataFrame, conn, table:str):
+    cur = conn.cursor()
+    cur.execute(f"PRAGMA table_info({table})")
+    existing = {c[1] for c in cur.fetchall()}
+    if not existing: # 테이블 없음 (to_sql이 생성)
+        return
+
+    for col in df.columns:
+        if col not in existing:
+            sql_type = "REAL" if pd.api.types.is_float_dtype(df[col]) else "INTEGER" if pd.api.types.is_integer_dtype(df[col]) else "TEXT"
+            cur.execute(f'ALTER TABLE {table} ADD COLUMN "{col}" {sql_type}')
+            print(f"{table} 테이블에 컬럼 추가: {col} ({sql_type})")
+    conn.commit()
+
 # SQLiteDB 적재
 def save_db(df:pd.DataFrame, conn, table:str, if_exists:str="append", chunksize:int=5000):
+    if if_exists == "append":
+        add_missing_columns(df, conn, table)
     df.to_sql(
         name=table,
         con=conn,
@@ -67,7 +85,7 @@ def save_db(df:pd.DataFrame, conn, table:str, if_exists:str="append", chunksize:
 
 # --- 2. 파이프라인 ---
 
-async def run_pipeline(conn, today, data_table:str="data", summary_table:str="summary", if_exists:str="append", chunksize:int=5000):
+async def run_pipeline(conn, today, data_table:str="data", summary_table:str="summary", if_exists:str="append", chunksize:int=5000, mode:str="full"):
     # 매달 1일에 지난 달 리뷰 보는 상황 가정
     # 날짜 계산
     # start_date = today.replace(day=1) # 이번 달 1일로 변경
@@ -76,26 +94,41 @@ async def run_pipeline(conn, today, data_table:str="data", summary_table:str="su
     start_date = end_date.replace(day=1) # 지난 달 1일
     yyyymm = start_date.strftime("%Y-%m")
 
-    # 이번 달 데이터 있는지 확인
-    # df_tmp = fetch_month_df(DB_PATH, data_table, yyyymm)
-    df_cur = collect_reviews_by_date(APP_ID, start_date, end_date)
-    
-    # 이번 달 데이터 추가 수집 -> DB 적재
-    # if len(df_tmp) != len(df_cur): # 중복 처리 조건 변경필요
-    # 재현성을 위해 삭제하고 다시 수집
-    delete_month_df(DB_PATH, data_table, yyyymm)
-    delete_month_df(DB_PATH, summary_table, yyyymm)
-    print(f"{len(df_cur)}개 수집 완료. ({start_date.strftime('%Y-%m-%d')}~{end_date.strftime('%Y-%m-%d')})")
+    if mode == "incremental":
+        # 증분 수집: DB에 저장된 최신 리뷰(워터마크) 이후만 수집
+        watermark, known_ids = fetch_watermark(DB_PATH, data_table)
+        if watermark and watermark >= start_date:
+            collect_start, exclude_ids = watermark, known_ids
+        else:
+            collect_start, exclude_ids = start_date, None
+        df_cur = collect_reviews_by_date(APP_ID, collect_start, end_date, exclude_ids=exclude_ids)
+
+        if df_cur.empty:
+            print("이미 최신 데이터 입니다.")
+            return 1
+        if_exists = "append" # 기존 데이터 유지
+        print(f"{len(df_cur)}개 신규 수집 완료. ({collect_start.strftime('%Y-%m-%d %H:%M:%S')}~{end_date.strftime('%Y-%m-%d')})")
+    else:
+        # 이번 달 데이터 있는지 확인
+        # df_tmp = fetch_month_df(DB_PATH, data_table, yyyymm)
+        df_cur = collect_reviews_by_date(APP_ID, start_date, end_date)
+        
+        # 이번 달 데이터 추가 수집 -> DB 적재
+        # if len(df_tmp) != len(df_cur): # 중복 처리 조건 변경필요
+        # 재현성을 위해 삭제하고 다시 수집
+        delete_month_df(DB_PATH, data_table, yyyymm)
+        delete_month_df(DB_PATH, summary_table, yyyymm)
+        print(f"{len(df_cur)}개 수집 완료. ({start_date.strftime('%Y-%m-%d')}~{end_date.strftime('%Y-%m-%d')})")
     
-    # 이탈의도분류
-    df_cur = infer_pipeline(df_cur, "model_out/bert-kor-base", text_col="content", batch=16)
+    # 이탈의도분류 (클래스별 확률 prob_0~2도 함께 저장 -> risk_summary/rethreshold.py로 재추론 없이 threshold 조정)
+    df_cur = get_service(MODEL_DIR).classify_df(df_cur, text_col="content", batch=16, cache_db=DB_PATH) # 모델은 프로세스당 1회만 로드
     df_cur0 = df_cur[df_cur['churn_intent_label'] == 0].copy()
     df_cur1 = df_cur[df_cur['churn_intent_label'] == 1].copy()
     df_cur2 = df_cur[df_cur['churn_intent_label'] == 2].copy()
     print(f"{len(df_cur)}개 이탈의도 분류 완료. (확정:{len(df_cur2)}개/불만:{len(df_cur1)}개/없음:{len(df_cur0)}개)")
     
     # 키워드도출
-    df_cur = await extract_keywords(df_cur, text_col="content", batch=100)
+    df_cur = await extract_keywords(df_cur, text_col="content", batch=100, memo_db=DB_PATH) # 이미 키워드를 뽑은 리뷰는 재요청 생략
     print(f"{len(df_cur)}개 키워드 도출 완료.")
     # 키워드 변환
     df_cur["keywords"] = df_cur["keywords"].map(safe_json_dumps)
@@ -104,11 +137,18 @@ async def run_pipeline(conn, today, data_table:str="data", summary_table:str="su
     # 데이터 DB 적재
     save_db(df_cur, conn, data_table, if_exists, chunksize)
 
+    # 증분 모드는 기존 데이터를 포함한 한 달 전체로 지수/요약 재계산
+    df_month = df_cur
+    if mode == "incremental":
+        df_month = fetch_month_df(DB_PATH, data_table, yyyymm)
+        df_month["keywords"] = df_month["keywords"].apply(parse_keywords)
+        delete_month_df(DB_PATH, summary_table, yyyymm)
+
     # 이탈지수계산
-    risk_score = risk_score_calc(df_cur)
+    risk_score = risk_score_calc(df_month)
     print("이탈 지수 계산 완료")
     # '확정' 키워드 기반 리뷰 요약
-    summary_complaint, summary_confirmed, target = summary_pipeline(df_cur)
+    summary_complaint, summary_confirmed, target = summary_pipeline(df_month)
     print("요약 카드 생성 완료")
 
     df_summary = pd.DataFrame([{
@@ -139,12 +179,13 @@ async def main():
     p.add_argument("--summary-table", type=str, default="summary", help="리뷰 요약 저장할 테이블 이름")
     p.add_argument("--if-exists", type=str, default="append", choices=["append", "replace"], help="이미 테이블이 존재하는 경우 어떻게 저장할건지")
     p.add_argument("--chunksize", type=int, default=5000, help="한 번에 DB에 적재할 청크사이즈")
+    p.add_argument("--mode", type=str, default="full", choices=["full", "incremental"], help="full: 지난 달 삭제 후 재수집, incremental: 저장된 최신 리뷰 이후만 수집")
 
     args = p.parse_args()
     
     conn = sqlite3.connect(args.db_path)
     try:
-        await run_pipeline(conn, TODAY, args.data_table, args.summary_table, args.if_exists, args.chunksize)
+        await run_pipeline(conn, TODAY, args.data_table, args.summary_table, args.if_exists, args.chunksize, args.mode)
     finally:
         conn.close()
 
@@ -1,7 +1,7 @@
 import ast
 import sqlite3
 import matplotlib as mpl
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import pandas as pd
 from collections import Counter
@@ -144,6 +144,33 @@ def delete_month_df(db_path: str, table: str, yyyymm: str):
     conn.commit()
     conn.close()
 
+# 저장된 최신 리뷰 시점(워터마크) 조회
+def fetch_watermark(db_path: str, table: str = "data") -> Tuple[datetime | None, set]:
+    """
+    증분 수집 기준점 조회
+    - 가장 최근 at 값과, 해당 시점에 저장된 reviewId 집합을 리턴
+    - 같은 초에 작성된 리뷰가 여러 개일 수 있으므로 ID 집합도 함께 사용
+    - 테이블이 없거나 비어있으면 (None, set())
+    """
+    conn = sqlite3.connect(db_path)
+
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,))
+        if cur.fetchone() is None:
+            return None, set()
+
+        cur.execute(f"SELECT MAX(at) FROM {table}")
+        max_at = cur.fetchone()[0]
+        if max_at is None:
+            return None, set()
+
+        cur.execute(f"SELECT reviewId FROM {table} WHERE at = ?", (max_at,))
+        ids = {r[0] for r in cur.fetchall()}
+        return pd.to_datetime(max_at).to_pydatetime(), ids
+    finally:
+        conn.close()
+
 # 키워드 카운팅
 def keyword_count(df:pd.DataFrame) -> Counter:
     all_reviews = [k for ks in df[KEYWORD_COL] for k in ks]
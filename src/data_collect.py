@@ -1,14 +1,31 @@
-from google_play_scraper import reviews, Sort
+from google_play_scraper import Sort
+from google_play_scraper.constants.element import ElementSpecs
+from google_play_scraper.constants.request import Formats
+from google_play_scraper.features.reviews import _fetch_review_items, MAX_COUNT_EACH_FETCH
 import pandas as pd
+import os
+import json
 import time
+import random
+import threading
+from itertools import product
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import argparse
+import sqlite3
+from importlib.metadata import version
+from src.data_io import FORMATS, write_table
+
+# request_page는 google_play_scraper 내부 함수(_fetch_review_items)를 직접 쓰므로 이 버전에서만 동작 보장 (requirements.txt와 동일하게 유지)
+SCRAPER_VERSION = "1.2.7"
+if version("google-play-scraper") != SCRAPER_VERSION:
+    raise ImportError(f"google-play-scraper=={SCRAPER_VERSION}가 필요합니다 (설치된 버전: {version('google-play-scraper')}). pip install -r requirements.txt")
 
 
 COLUMNS = ['reviewId', 'userName', 'content', 'score', 'thumbsUpCount', 'at']
 
 def list_to_df(all_reviews: list) -> pd.DataFrame:
-    df = pd.DataFrame(all_reviews)
+    df = pd.DataFrame(all_reviews, columns=COLUMNS) # 수집 결과가 없어도 컬럼 유지
 
     # userName 결측치 처리
     df.loc[df['userName'].isna(), 'userName'] = "Google 사용자"
@@ -17,25 +34,131 @@ def list_to_df(all_reviews: list) -> pd.DataFrame:
     
     return df[COLUMNS]
 
-def collect_reviews_by_num(app_id, num: int=1000, lang="ko", country="kr", batch_size=200, sleep_sec=0.2):
-    all_reviews = []
-    continuation_token = None
-    seen = set()
-    collected = 0
+# 토큰 버킷 요청 제한 (여러 스레드가 하나를 공유)
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate # 초당 충전되는 토큰 수 (= 초당 요청 수)
+        self.capacity = capacity if capacity is not None else max(1.0, rate) # 순간적으로 허용되는 최대 요청 수
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+# 리뷰 1페이지 요청 (실패 시 지터를 섞은 지수 백오프로 재시도)
+# reviews()는 요청 오류를 내부에서 삼키고 "마지막 페이지"처럼 리턴하므로 한 단계 아래 함수를 직접 호출
+# token: 다음 페이지 토큰 문자열 (첫 페이지는 None), 리턴: (리뷰 리스트, 다음 페이지 토큰 또는 None(마지막 페이지))
+def request_page(app_id, lang, country, batch_size, token, limiter=None, max_retries=3, backoff_sec=1.0, filter_score_with=None):
+    url = Formats.Reviews.build(lang=lang, country=country)
+
+    for attempt in range(max_retries + 1):
+        if limiter:
+            limiter.acquire()
+        try:
+            items, next_token = _fetch_review_items(
+                url,
+                app_id,
+                Sort.NEWEST.value,
+                min(batch_size, MAX_COUNT_EACH_FETCH),
+                filter_score_with, # None이면 전체 별점
+                None,
+                token,
+            )
+            break
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            wait = backoff_sec * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"[{app_id}/{lang}/{country}] 요청 실패 ({attempt+1}/{max_retries}): {e} -> {wait:.1f}초 후 재시도")
+            time.sleep(wait)
 
+    if isinstance(next_token, list): # 라이브러리와 동일하게 마지막 페이지로 처리
+        next_token = None
+    result = [{k: spec.extract_content(r) for k, spec in ElementSpecs.Review.items()} for r in items]
+    return result, next_token
+
+# 리뷰 페이지 단위 요청 (최신순)
+def iter_review_pages(app_id, lang="ko", country="kr", batch_size=200, sleep_sec=0.2, continuation_token=None, limiter=None, filter_score_with=None):
     while True:
-        result, continuation_token = reviews(
-            app_id,
-            lang=lang,
-            country=country,
-            sort=Sort.NEWEST,
-            count=batch_size,
-            continuation_token=continuation_token
-        )
+        result, continuation_token = request_page(app_id, lang, country, batch_size, continuation_token, limiter, filter_score_with=filter_score_with)
 
         if not result:
             break
 
+        yield result, continuation_token
+
+        if continuation_token is None: # 마지막 페이지
+            break
+
+        # limiter가 있으면 요청 간격은 limiter가 조절
+        if limiter is None:
+            time.sleep(sleep_sec)
+
+# --- 체크포인트 (중단된 수집 이어하기) ---
+
+# 다음 페이지 토큰 + 수집 조건 + 마지막 페이지 리뷰 ID 저장
+# 중복은 수집 중 새 리뷰가 추가되어 페이지 경계가 밀릴 때만 생기므로 전체 seen 대신 마지막 페이지 ID만 기록 (파일 크기 고정)
+def save_checkpoint(path: str, params: dict, continuation_token, page_ids, collected: int, done: bool=False):
+    state = {
+        "params": params,
+        "token": continuation_token, # 다음 페이지 토큰 문자열
+        "page_ids": list(page_ids),
+        "collected": collected,
+        "done": done,
+    }
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, path) # 쓰는 도중 중단되어도 기존 체크포인트는 유지
+
+# 체크포인트 로드 (없으면 None), 수집 조건(앱/모드/언어/국가/개수/기간 등)이 다르면 에러
+def load_checkpoint(path: str, params: dict) -> dict | None:
+    if not os.path.exists(path):
+        return None
+
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+
+    saved = state.get("params", {})
+    diff = [k for k in sorted(set(saved) | set(params)) if saved.get(k) != params.get(k)]
+    if diff:
+        detail = ", ".join(f"{k}: {saved.get(k)} -> {params.get(k)}" for k in diff)
+        raise ValueError(f"체크포인트의 수집 조건이 다릅니다 ({detail}): {path}")
+
+    state["page_ids"] = set(state["page_ids"])
+    return state
+
+# --- 스트리밍 수집 (페이지별 DataFrame 반환) ---
+# checkpoint 경로를 주면 페이지가 저장될 때마다 상태를 기록하고, 다음 실행 시 그 지점부터 이어서 수집
+
+def stream_reviews_by_num(app_id, num: int=1000, lang="ko", country="kr", batch_size=200, sleep_sec=0.2, limiter=None, checkpoint=None):
+    seen = set()
+    collected = 0
+    continuation_token = None
+    params = {"app_id": app_id, "mode": "num", "lang": lang, "country": country, "num": num}
+
+    state = load_checkpoint(checkpoint, params) if checkpoint else None
+    if state:
+        if state["done"]:
+            return
+        continuation_token, seen, collected = state["token"], state["page_ids"], state["collected"]
+        print(f"체크포인트에서 이어서 수집 (누적 {collected}개)")
+
+    stop = False
+    for result, continuation_token in iter_review_pages(app_id, lang, country, batch_size, sleep_sec, continuation_token, limiter):
+        page = []
         stop = False
 
         for r in result:
@@ -43,46 +166,52 @@ def collect_reviews_by_num(app_id, num: int=1000, lang="ko", country="kr", batch
             rid = r.get("reviewId")
             if rid not in seen:
                 seen.add(rid)
-                all_reviews.append(r)
+                page.append(r)
                 collected += 1
             
             if collected >= num:
                 stop = True
                 break
 
-        if stop:
-            break
+        if page:
+            yield list_to_df(page)
 
-        if continuation_token is None:
-            break
+        # yield 이후에 기록 -> 호출한 쪽에서 페이지 저장이 끝난 시점
+        if checkpoint:
+            save_checkpoint(checkpoint, params, continuation_token, (r.get("reviewId") for r in result), collected, done=stop)
 
-        time.sleep(sleep_sec)
+        if stop:
+            break
 
-    return list_to_df(all_reviews)
+    if checkpoint and not stop:
+        save_checkpoint(checkpoint, params, continuation_token, [], collected, done=True)
 
 
-def collect_reviews_by_date(app_id, start_date, end_date=None, lang="ko", country="kr", batch_size=200, sleep_sec=0.2):
-    all_reviews = []
+def stream_reviews_by_date(app_id, start_date, end_date=None, lang="ko", country="kr", batch_size=200, sleep_sec=0.2, exclude_ids=None, limiter=None, checkpoint=None, filter_score_with=None):
+    seen = set(exclude_ids) if exclude_ids else set() # 이미 저장된 리뷰 ID는 수집 대상에서 제외
+    collected = 0
     continuation_token = None
-    seen = set()
+    params = {
+        "app_id": app_id, "mode": "date", "lang": lang, "country": country,
+        "start_date": start_date.isoformat(), "end_date": end_date.isoformat() if end_date else None,
+        "filter_score_with": filter_score_with,
+    }
+
+    state = load_checkpoint(checkpoint, params) if checkpoint else None
+    if state:
+        if state["done"]:
+            return
+        continuation_token, collected = state["token"], state["collected"]
+        seen |= state["page_ids"]
+        print(f"체크포인트에서 이어서 수집 (누적 {collected}개)")
 
     start_date = start_date.replace(tzinfo=None)
     if end_date:
         end_date = end_date.replace(tzinfo=None)
 
-    while True:
-        result, continuation_token = reviews(
-            app_id,
-            lang=lang,
-            country=country,
-            sort=Sort.NEWEST,
-            count=batch_size,
-            continuation_token=continuation_token
-        )
-
-        if not result:
-            break
-
+    stop = False
+    for result, continuation_token in iter_review_pages(app_id, lang, country, batch_size, sleep_sec, continuation_token, limiter, filter_score_with):
+        page = []
         stop = False
 
         for r in result:
@@ -101,26 +230,138 @@ def collect_reviews_by_date(app_id, start_date, end_date=None, lang="ko", countr
             rid = r.get("reviewId")
             if rid not in seen:
                 seen.add(rid)
-                all_reviews.append(r)
+                page.append(r)
+                collected += 1
+
+        if page:
+            yield list_to_df(page)
+
+        if checkpoint:
+            save_checkpoint(checkpoint, params, continuation_token, (r.get("reviewId") for r in result), collected, done=stop)
 
         if stop:
             break
 
-        if continuation_token is None:
-            break
+    if checkpoint and not stop:
+        save_checkpoint(checkpoint, params, continuation_token, [], collected, done=True)
+
+# --- 페이지 저장 (sink) ---
+
+# 페이지마다 CSV에 이어쓰기
+def sink_to_csv(pages, path: str, append: bool=False) -> int:
+    total = 0
+    for i, page in enumerate(pages):
+        first = (i == 0 and not (append and os.path.exists(path))) # 이어쓰기면 헤더 생략
+        page.to_csv(path, mode="w" if first else "a", header=first, encoding='utf-8-sig', index=False)
+        total += len(page)
+        print(f"페이지 {i+1} 저장 (누적 {total}개)")
+    return total
+
+# 페이지마다 SQLite 테이블에 bulk insert
+def sink_to_sqlite(pages, db_path: str, table: str="data") -> int:
+    total = 0
+    conn = sqlite3.connect(db_path)
+    try:
+        for i, page in enumerate(pages):
+            page.to_sql(name=table, con=conn, if_exists="append", index=False, method="multi")
+            conn.commit()
+            total += len(page)
+            print(f"페이지 {i+1} 저장 (누적 {total}개)")
+    finally:
+        conn.close()
+    return total
 
-        time.sleep(sleep_sec)
+# --- 일괄 수집 (DataFrame 1개 반환) ---
 
-    return list_to_df(all_reviews)
+def _concat_pages(pages) -> pd.DataFrame:
+    dfs = list(pages)
+    if not dfs:
+        return list_to_df([])
+    return pd.concat(dfs, ignore_index=True)
+
+def collect_reviews_by_num(app_id, num: int=1000, lang="ko", country="kr", batch_size=200, sleep_sec=0.2, limiter=None):
+    return _concat_pages(stream_reviews_by_num(app_id, num, lang, country, batch_size, sleep_sec, limiter=limiter))
+
+
+def collect_reviews_by_date(app_id, start_date, end_date=None, lang="ko", country="kr", batch_size=200, sleep_sec=0.2, exclude_ids=None, limiter=None, filter_score_with=None):
+    return _concat_pages(stream_reviews_by_date(app_id, start_date, end_date, lang, country, batch_size, sleep_sec, exclude_ids, limiter=limiter, filter_score_with=filter_score_with))
+
+# --- 별점별 병렬 수집 ---
+
+def stream_reviews_by_date_sharded(app_id, start_date, end_date=None, lang="ko", country="kr", batch_size=200, sleep_sec=0.2,
+                                   scores=(1, 2, 3, 4, 5), workers=5, limiter=None, low_star_first=False):
+    """
+    별점(filter_score_with)별로 스트림을 나눠 동시에 수집하고 별점 단위 DataFrame을 반환
+    - low_star_first=False: 먼저 끝난 별점부터 반환
+    - low_star_first=True: 낮은 별점부터 순서대로 반환 (이탈 분석 대상을 먼저 넘겨줌)
+    """
+    seen = set()
+    order = sorted(scores) if low_star_first else list(scores)
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = {
+            ex.submit(collect_reviews_by_date, app_id, start_date, end_date, lang, country, batch_size, sleep_sec,
+                      limiter=limiter, filter_score_with=score): score
+            for score in order
+        }
+        done = list(futures) if low_star_first else as_completed(futures) # dict는 제출 순서 유지
+
+        for fut in done:
+            df = fut.result()
+            # 수집 중 별점이 수정된 리뷰는 두 스트림에 모두 나올 수 있음
+            df = df[~df["reviewId"].isin(seen)]
+            seen.update(df["reviewId"])
+            print(f"별점 {futures[fut]}점 {len(df)}개 수집 완료")
+            if len(df):
+                yield df
+
+
+def collect_reviews_by_date_sharded(app_id, start_date, end_date=None, lang="ko", country="kr", batch_size=200, sleep_sec=0.2,
+                                    scores=(1, 2, 3, 4, 5), workers=5, limiter=None):
+    df = _concat_pages(stream_reviews_by_date_sharded(app_id, start_date, end_date, lang, country, batch_size, sleep_sec, scores, workers, limiter))
+    # 단일 스트림 수집과 같은 최신순으로 정렬
+    return df.sort_values("at", ascending=False, kind="stable").reset_index(drop=True)
+
+# --- 다중 앱/국가 병렬 수집 ---
+
+def collect_jobs(jobs, collect_fn, rate: float=5.0, burst: float | None=None, workers: int=4) -> pd.DataFrame:
+    """
+    (app_id, lang, country) 작업들을 스레드풀로 동시에 수집
+    - 모든 작업이 하나의 토큰 버킷을 공유하므로 전체 요청 속도는 rate(초당 요청 수)로 제한
+    - collect_fn(app_id, lang, country, limiter) -> DataFrame
+    - 결과에 appId/lang/country 컬럼 추가
+    """
+    limiter = TokenBucket(rate, burst)
+    results = []
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = {ex.submit(collect_fn, app_id, lang, country, limiter): (app_id, lang, country) for app_id, lang, country in jobs}
+
+        for fut in as_completed(futures):
+            app_id, lang, country = futures[fut]
+            try:
+                df = fut.result()
+            except Exception as e:
+                print(f"[{app_id}/{lang}/{country}] 수집 실패: {e}")
+                continue
+
+            df = df.assign(appId=app_id, lang=lang, country=country)
+            results.append(df)
+            print(f"[{app_id}/{lang}/{country}] {len(df)}개 수집 완료")
+
+    if not results:
+        return list_to_df([]).assign(appId=None, lang=None, country=None)
+    return pd.concat(results, ignore_index=True)
 
 
 def main():
     p = argparse.ArgumentParser(description="구글플레이스토어 리뷰데이터 수집")
-    p.add_argument("--app-id", type=str, default="com.sampleapp", help="앱 ID")
+    p.add_argument("--app-id", type=str, nargs="+", default=["com.sampleapp"], help="앱 ID (여러 개 입력 시 병렬 수집)")
     p.add_argument("--mode", required=True, choices=["num", "date"], help="num/date")
     p.add_argument("--out", required=True, help="수집된 데이터 저장 경로")
-    p.add_argument("--lang", default="ko", help="리뷰 언어 코드 (예: en, ja)")
-    p.add_argument("--country", default="kr", help="국가 코드 (예: us, jp)")
+    p.add_argument("--format", default=None, choices=FORMATS, help="저장 포맷 (미입력시 --out 확장자로 판단, 기본 csv)")
+    p.add_argument("--lang", nargs="+", default=["ko"], help="리뷰 언어 코드 (예: en, ja)")
+    p.add_argument("--country", nargs="+", default=["kr"], help="국가 코드 (예: us, jp)")
     p.add_argument("--batch", type=int, default=200, help="한 번 요청할 때 가져올 리뷰 개수")
     p.add_argument("--sleep", type=float, default=0.2, help="요청 간 대기 시간(초)")
     # mode: num
@@ -128,19 +369,64 @@ def main():
     # mode: date
     p.add_argument("--start-date", type=str, default="2026-01-01", help="기간 시작일(YYYY-MM-DD)")
     p.add_argument("--end-date", type=str, default=None, help="기간 종료일(YYYY-MM-DD)") # 미입력시 최신까지
+    # 스트리밍 저장
+    p.add_argument("--stream", action="store_true", help="페이지 단위로 바로 저장 (메모리 사용량 고정)")
+    p.add_argument("--table", type=str, default="data", help="--out이 .db/.sqlite인 경우 저장할 테이블 이름")
+    # 이어하기
+    p.add_argument("--resume", action="store_true", help="체크포인트 지점부터 이어서 수집 (스트리밍 저장으로 동작)")
+    p.add_argument("--checkpoint", type=str, default=None, help="체크포인트 경로 (기본: <out>.ckpt.json)")
+    # 별점별 병렬 수집 (mode: date)
+    p.add_argument("--shard-by-score", action="store_true", help="별점(1~5점)별 스트림을 동시에 수집")
+    p.add_argument("--low-star-first", action="store_true", help="--shard-by-score 스트리밍 저장 시 낮은 별점부터 저장")
+    # 병렬 수집 (app-id x lang x country 조합이 2개 이상일 때)
+    p.add_argument("--workers", type=int, default=4, help="동시에 수집할 작업 수")
+    p.add_argument("--rate", type=float, default=5.0, help="전체 작업이 공유하는 초당 요청 수")
     args = p.parse_args()
+    if (args.stream or args.resume) and args.format not in (None, "csv"):
+        p.error("--stream/--resume은 csv 또는 .db/.sqlite 저장만 지원합니다.")
+    if (args.resume or args.checkpoint) and (len(args.app_id) * len(args.lang) * len(args.country) > 1 or args.shard_by_score):
+        p.error("--resume/--checkpoint는 단일 앱/언어/국가 수집에서만 지원합니다. (병렬 수집, --shard-by-score 제외)")
 
     start_time = time.time()
-    if args.mode == 'num':
-        df = collect_reviews_by_num(args.app_id, args.num, args.lang, args.country, args.batch, args.sleep)
-    elif args.mode == 'date':
-        start_dt = datetime.strptime(args.start_date, "%Y-%m-%d")
-        end_dt = datetime.strptime(args.end_date, "%Y-%m-%d") if args.end_date else None
-        df = collect_reviews_by_date(args.app_id, start_dt, end_dt, args.lang, args.country, args.batch, args.sleep)
-    df.to_csv(args.out, encoding='utf-8-sig', index=False)
+    start_dt = datetime.strptime(args.start_date, "%Y-%m-%d")
+    end_dt = datetime.strptime(args.end_date, "%Y-%m-%d") if args.end_date else None
+    jobs = list(product(args.app_id, args.lang, args.country))
+
+    if len(jobs) > 1:
+        if args.mode == 'num':
+            collect_fn = lambda app_id, lang, country, limiter: collect_reviews_by_num(app_id, args.num, lang, country, args.batch, limiter=limiter)
+        elif args.mode == 'date':
+            collect_fn = lambda app_id, lang, country, limiter: collect_reviews_by_date(app_id, start_dt, end_dt, lang, country, args.batch, limiter=limiter)
+        pages = [collect_jobs(jobs, collect_fn, args.rate, workers=args.workers)]
+    elif args.mode == 'date' and args.shard_by_score:
+        if args.stream or args.out.endswith((".db", ".sqlite")):
+            pages = stream_reviews_by_date_sharded(args.app_id[0], start_dt, end_dt, args.lang[0], args.country[0], args.batch, args.sleep, low_star_first=args.low_star_first)
+        else:
+            pages = [collect_reviews_by_date_sharded(args.app_id[0], start_dt, end_dt, args.lang[0], args.country[0], args.batch, args.sleep)]
+    else:
+        # 스트리밍 저장 시 체크포인트 기록 (새로 시작하면 기존 체크포인트 무시)
+        checkpoint = None
+        if args.stream or args.resume or args.out.endswith((".db", ".sqlite")):
+            checkpoint = args.checkpoint or f"{args.out}.ckpt.json"
+            if not args.resume and os.path.exists(checkpoint):
+                os.remove(checkpoint)
+
+        if args.mode == 'num':
+            pages = stream_reviews_by_num(args.app_id[0], args.num, args.lang[0], args.country[0], args.batch, args.sleep, checkpoint=checkpoint)
+        elif args.mode == 'date':
+            pages = stream_reviews_by_date(args.app_id[0], start_dt, end_dt, args.lang[0], args.country[0], args.batch, args.sleep, checkpoint=checkpoint)
+
+    if args.out.endswith((".db", ".sqlite")):
+        total = sink_to_sqlite(pages, args.out, args.table)
+    elif args.stream or args.resume:
+        total = sink_to_csv(pages, args.out, append=args.resume)
+    else:
+        df = _concat_pages(pages)
+        write_table(df, args.out, args.format)
+        total = len(df)
     end_time = time.time()
     print(f"소요 시간: {time.strftime('%H:%M:%S', time.gmtime(end_time - start_time))}")
-    print(f"총 {len(df)}개 수집 및 저장 완료: {args.out}")
+    print(f"총 {total}개 수집 및 저장 완료: {args.out}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
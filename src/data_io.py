@@ -0,0 +1,120 @@
+import os
+import ast
+import json
+import pandas as pd
+
+
+FORMATS = ["csv", "parquet", "feather"] # parquet/feather는 pyarrow 필요
+DATE_COLS = ["at"]
+INT8_COLS = ["score", "churn_intent_label"]
+LIST_COLS = ["keywords"]
+
+# 경로 확장자로 포맷 추론 (기본 csv)
+def infer_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext in ("parquet", "pq"):
+        return "parquet"
+    if ext in ("feather", "arrow"):
+        return "feather"
+    return "csv"
+
+# 문자열로 저장된 리스트 -> list[str]
+def to_str_list(x) -> list:
+    if isinstance(x, list):
+        return [str(k) for k in x]
+    if x is None or (isinstance(x, float) and pd.isna(x)):
+        return []
+    if hasattr(x, "tolist"): # pyarrow에서 읽은 numpy 배열
+        return [str(k) for k in x.tolist()]
+
+    s = str(x).strip()
+    if s.startswith("[") and s.endswith("]"):
+        for parse in (json.loads, ast.literal_eval):
+            try:
+                out = parse(s)
+                if isinstance(out, list):
+                    return [str(k).strip() for k in out if str(k).strip()]
+            except Exception:
+                pass
+    return [k.strip() for k in s.split(",") if k.strip()]
+
+# 컬럼 타입 지정 (at: datetime, 라벨/별점: int8, keywords: list<string>)
+def apply_types(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+
+    for col in DATE_COLS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+
+    for col in INT8_COLS:
+        if col in df.columns:
+            s = pd.to_numeric(df[col], errors="coerce")
+            df[col] = s.astype("int8") if s.notna().all() else s.astype("Int8") # 결측치가 있으면 nullable 타입
+
+    for col in LIST_COLS:
+        if col in df.columns:
+            df[col] = df[col].map(to_str_list)
+
+    return df
+
+# 포맷에 맞게 로드
+def read_table(path: str, fmt: str | None = None, **csv_kwargs) -> pd.DataFrame:
+    fmt = fmt or infer_format(path)
+
+    if fmt == "parquet":
+        df = pd.read_parquet(path)
+    elif fmt == "feather":
+        df = pd.read_feather(path)
+    else:
+        return pd.read_csv(path, **{"encoding": "utf-8-sig", **csv_kwargs})
+
+    # list<string> 컬럼은 numpy 배열로 읽히므로 list로 변환
+    for col in LIST_COLS:
+        if col in df.columns:
+            df[col] = df[col].map(to_str_list)
+    return df
+
+# chunksize행씩 나눠서 로드 (index는 파일 전체 기준 행 번호)
+def iter_table(path: str, chunksize: int, fmt: str | None = None, **csv_kwargs):
+    fmt = fmt or infer_format(path)
+
+    if fmt == "csv":
+        yield from pd.read_csv(path, chunksize=chunksize, **{"encoding": "utf-8-sig", **csv_kwargs})
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if fmt == "parquet":
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunksize)
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(path)) # feather(v2)는 Arrow IPC 파일
+        batches = (
+            rb.slice(i, chunksize)
+            for rb in (reader.get_batch(b) for b in range(reader.num_record_batches))
+            for i in range(0, rb.num_rows, chunksize)
+        )
+
+    offset = 0
+    for rb in batches:
+        df = rb.to_pandas()
+        df.index = pd.RangeIndex(offset, offset + len(df))
+        offset += len(df)
+        for col in LIST_COLS:
+            if col in df.columns:
+                df[col] = df[col].map(to_str_list)
+        yield df
+
+# 포맷에 맞게 저장
+def write_table(df: pd.DataFrame, path: str, fmt: str | None = None, **csv_kwargs):
+    fmt = fmt or infer_format(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True) # 부모디렉토리
+
+    if fmt == "parquet":
+        apply_types(df).to_parquet(path, index=False)
+    elif fmt == "feather":
+        apply_types(df).reset_index(drop=True).to_feather(path)
+    elif fmt == "csv":
+        df.to_csv(path, **{"index": False, "encoding": "utf-8-sig", **csv_kwargs})
+    else:
+        raise ValueError(f"지원하지 않는 포맷: {fmt} (지원: {FORMATS})")
@@ -1,13 +1,16 @@
 import re
 import argparse
 import json
-import os
 import asyncio
 import time
 from typing import Any, List
 
-import pandas as pd
-from google import genai
+
+from src.data_io import FORMATS, read_table, write_table
+from src.llm_memo import LLMMemo, memo_key, prompt_version, split_misses
+from src.llm_limiter import AdaptiveLimiter
+from src.llm_client import add_client_args, client_from_args, LazyClient, resolve_client
+from src.llm_batch import salvage_batch, estimate_tokens, pack_batches, describe_batches
 
 
 # --- 1. 사전 정의 ---
@@ -29,13 +32,20 @@ STATUS = ["지연", "느림", "빠름",
 # 배민 고유 서비스
 SERVICE_KEYWORDS = ["한집배달", "가게배달", "알뜰배달", "배민1", "배민스토어", "B마트", "배민클럽", "배민패스"]
 
+TEMPERATURE = 0.1
+REQUEST_TIMEOUT = 120 # 요청 1회 제한 시간(초), 초과 시 혼잡으로 보고 동시성 축소
+
 
 # --- 2. 프롬프트 생성 ---
 
+# LLM이 실수없이 잘 이해할 수 있도록 "ID_1: 맛있어요" 형식으로 묶음.
+def format_item(i: int, text: str) -> str:
+    return f"ID_{i+1}: {text}"
+
+
 def build_batch_prompt(texts: List[str]) -> str:
-    # LLM이 실수없이 잘 이해할 수 있도록 "ID_1: 맛있어요" 형식으로 묶음.
     text_inputs = "\n".join([
-        f"ID_{i+1}: {t}" for i, t in enumerate(texts)
+        format_item(i, t) for i, t in enumerate(texts)
     ])
     
     return f"""
@@ -77,6 +87,16 @@ def build_batch_prompt(texts: List[str]) -> str:
 """.strip()
 
 
+# 프롬프트/설정이 바뀌면 메모 키가 바뀜
+PROMPT_VERSION = prompt_version(build_batch_prompt(["{text}"]), temperature=TEMPERATURE)
+
+# 배치 구성용 토큰 추정 (고정 지시문, 리뷰 1개당 예상 출력)
+BASE_TOKENS = estimate_tokens(build_batch_prompt([]))
+OUTPUT_TOKENS_PER_ITEM = 40 # {"id": n, "keywords": [...]} 1개
+MAX_INPUT_TOKENS = 12000
+MAX_OUTPUT_TOKENS = 6000 # 모델 출력 한도(8192)보다 여유있게
+
+
 # --- 3. json 추출 ---
 
 def extract_json(s: str) -> Any:
@@ -103,56 +123,89 @@ def extract_json(s: str) -> Any:
 
 # --- 4. 비동기 처리 ---
 
-async def process_batch(client, model, batch_texts, batch_index, semaphore) -> List[List[str]]:
-    async with semaphore: # 동시 요청 수 제한
-        prompt = build_batch_prompt(batch_texts)
-        
-        for attempt in range(3): # 재시도 로직
-            try:
-                # aio 클라이언트면 to_thread 없이 바로 await
-                resp = await client.models.generate_content(
+def accept_keywords(item):
+    kw = item.get("keywords")
+    return kw if isinstance(kw, list) else None
+
+
+# 행별 결과 리스트 리턴, 끝내 실패한 행은 None (빈 키워드와 구분해서 메모에 저장하지 않기 위함)
+async def process_batch(client, model, batch_texts, batch_index, limiter: AdaptiveLimiter, timeout: float = REQUEST_TIMEOUT) -> List[List[str] | None]:
+    async def request(rows):
+        # 요청 1회만 슬롯 점유 (재시도 대기 중에는 다른 배치가 슬롯 사용)
+        async with limiter.slot():
+            resp = await asyncio.wait_for(
+                client.models.generate_content(
                     model=model,
-                    contents=prompt,
-                    config={"temperature": 0.1},
-                )
-                
-                data = extract_json(resp.text)
-                if isinstance(data, list) and len(data) == len(batch_texts):
-                    # data = sorted(data, key=lambda x: x.get("id", 10**9)) # 모델이 순서를 섞어주는 경우를 방지하기 위한 안전장치
-                    print(f"배치 {batch_index} 완료")
-                    return [item.get("keywords", []) for item in data]
-                
-            except Exception as e:
-                print(f"배치 {batch_index} 시도 {attempt+1} 실패: {e}")
-                await asyncio.sleep(2**attempt) # 지수 백오프
-        
-        print(f"배치 {batch_index} 최종 실패")
-        return [[] for _ in batch_texts]
+                    contents=build_batch_prompt([batch_texts[r] for r in rows]),
+                    config={"temperature": TEMPERATURE},
+                ),
+                timeout,
+            )
+        return resp.text
 
+    # ID_n 기준으로 정상 항목은 받고 누락/오류 항목만 재요청
+    result = await salvage_batch(request, len(batch_texts), extract_json, accept_keywords, batch_index, limiter)
 
-# --- 5. 키워드 도출 ---
+    failed = sum(r is None for r in result)
+    if failed:
+        print(f"배치 {batch_index} : {failed}개 최종 실패")
+    else:
+        print(f"배치 {batch_index} 완료 ({limiter.status()})")
+    return result
 
-async def extract_keywords(df, text_col, batch, model:str="gemini-2.0-flash", parallel:int=10):
-    semaphore = asyncio.Semaphore(parallel)
-
-    async with genai.Client().aio as client:
-        tasks = []
-        # 배치 단위 태스크 생성
-        for i in range(0, len(df), batch):
-            batch_texts = (
-                df.iloc[i:i+batch][text_col]
-                  .fillna("")
-                  .astype(str)
-                  .tolist()
-            )
-            tasks.append(process_batch(client, model, batch_texts, i//batch + 1, semaphore))
 
-        # 모든 태스크 실행 및 결과 수집
-        results = await asyncio.gather(*tasks)
-    
-    # 2차원 리스트 평탄화
-    flat_results = [item for batch in results for item in batch]
-    df["keywords"] = flat_results
+# --- 5. 키워드 도출 ---
+
+# memo_db 지정 시 (리뷰 내용, 프롬프트 버전, 모델)로 저장된 결과는 재사용하고 나머지만 요청
+# parallel: 시작 동시 요청 수, max_parallel: AIMD로 늘릴 수 있는 최대값
+# batch: 요청당 최대 리뷰 수(0: 개수 제한 없음), 실제 배치는 입력/출력 토큰 예산 안에서 채움 (예산도 0이면 제한 없음)
+async def extract_keywords(df, text_col, batch, model:str="gemini-2.0-flash", parallel:int=10, memo_db:str|None=None, max_parallel:int|None=None,
+                           max_input_tokens:int=MAX_INPUT_TOKENS, max_output_tokens:int=MAX_OUTPUT_TOKENS, client=None):
+    limiter = AdaptiveLimiter(initial=parallel, max_limit=max_parallel or parallel * 4)
+    texts = df[text_col].fillna("").astype(str).tolist()
+
+    memo = LLMMemo(memo_db) if memo_db else None
+    keys = [memo_key(t) for t in texts]
+    found = {k: r["keywords"] for k, r in memo.get_many(set(keys), PROMPT_VERSION, model).items()} if memo else {}
+
+    # 메모에 없는 리뷰(내용 기준 중복 제거)만 다시 묶음
+    miss_rows = split_misses(keys, found)
+    if memo:
+        print(f"키워드 메모 : {len(texts) - sum(k not in found for k in keys)}개 적중 / 신규 요청 {len(miss_rows)}개")
+
+    batches = pack_batches(
+        [format_item(i, texts[r]) for i, r in enumerate(miss_rows)], BASE_TOKENS, batch,
+        max_input_tokens, max_output_tokens, OUTPUT_TOKENS_PER_ITEM,
+    )
+    batches = [[miss_rows[j] for j in b] for b in batches]
+    print(describe_batches(batches))
+
+    results = []
+    if batches: # 전부 메모 적중이면 클라이언트를 만들지 않음
+        # client 미지정 시 환경변수 LLM_MODE 기준 (live/record/replay/mock), 생성 함수면 여기서 생성
+        async with resolve_client(client).aio as aclient:
+            tasks = []
+            # 배치 단위 태스크 생성
+            for i, rows in enumerate(batches):
+                tasks.append(process_batch(aclient, model, [texts[r] for r in rows], i + 1, limiter))
+
+            # 모든 태스크 실행 및 결과 수집
+            results = await asyncio.gather(*tasks)
+        print(limiter.summary())
+
+    new = {}
+    for rows, result in zip(batches, results):
+        for k, kw in zip((keys[r] for r in rows), result):
+            if kw is None: # 실패한 행은 빈 키워드로 채우고 메모에는 저장하지 않음
+                found[k] = []
+            else:
+                new[k] = kw
+
+    if memo:
+        memo.put_many({k: {"keywords": kw} for k, kw in new.items()}, PROMPT_VERSION, model)
+    found.update(new)
+
+    df["keywords"] = [found[k] for k in keys]
 
     return df
 
@@ -164,25 +217,34 @@ async def main_async():
     p.add_argument("--csv", required=True)
     p.add_argument("--text-col", default="content")
     p.add_argument("--out", required=True)
-    p.add_argument("--batch", type=int, default=100)
-    p.add_argument("--parallel", type=int, default=10) # 동시 실행 배치 수
+    p.add_argument("--format", default=None, choices=FORMATS, help="저장 포맷 (미입력시 --out 확장자로 판단, 기본 csv)")
+    p.add_argument("--batch", type=int, default=100) # 요청당 최대 리뷰 수 (0: 토큰 예산으로만 구성)
+    p.add_argument("--max-input-tokens", type=int, default=MAX_INPUT_TOKENS, help="요청당 입력 토큰 예산 (추정치, 0: 제한 없음)")
+    p.add_argument("--max-output-tokens", type=int, default=MAX_OUTPUT_TOKENS, help="요청당 출력 토큰 예산 (추정치, 0: 제한 없음)")
+    p.add_argument("--parallel", type=int, default=10) # 시작 동시 실행 배치 수
+    p.add_argument("--max-parallel", type=int, default=None, help="동시 실행 배치 수 상한 (기본: --parallel x 4, 429/5xx 발생 시 자동 축소)")
     p.add_argument("--model", default="gemini-2.0-flash")
+    p.add_argument("--memo-db", default=None, help="리뷰별 결과 메모 SQLite 경로 (같은 리뷰/프롬프트/모델은 재요청 생략)")
+    add_client_args(p)
 
     args = p.parse_args()
+    client = LazyClient(lambda: client_from_args(args)) # 보낼 요청이 있을 때만 생성
     
     # 데이터 로드
-    df = pd.read_csv(args.csv)
-    print(f"총 {len(df)}개 데이터를 {args.batch}개씩 비동기 처리 시작")
+    df = read_table(args.csv)
+    print(f"총 {len(df)}개 데이터를 최대 {args.batch}개씩 비동기 처리 시작")
     
     # 키워드 도출
     start_time = time.time()
-    df = await extract_keywords(df, args.text_col, args.batch, args.model, args.parallel)
+    df = await extract_keywords(df, args.text_col, args.batch, args.model, args.parallel, args.memo_db, args.max_parallel,
+                                args.max_input_tokens, args.max_output_tokens, client)
     end_time = time.time()
     print(f"소요 시간: {time.strftime('%H:%M:%S', time.gmtime(end_time - start_time))}")
+    if hasattr(client.client, "summary"): # mock
+        print(client.client.summary())
 
     # 저장
-    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True) # 부모디렉토리
-    df.to_csv(args.out, index=False, encoding="utf-8-sig")
+    write_table(df, args.out, args.format)
     print(f"저장 완료: {args.out}")
 
 if __name__ == "__main__":
@@ -1,13 +1,14 @@
 import re
 import argparse
 import json
-import os
 import time
 from typing import Any, List, Dict
 
 import pandas as pd
 from google import genai  # pip install -U google-genai
 
+from src.data_io import FORMATS, read_table, write_table
+
 
 # --- 1. 프롬프트 생성 ---
 
@@ -148,10 +149,11 @@ def label_subset(df_sub: pd.DataFrame, client, args) -> pd.DataFrame:
 
 def main():
     p = argparse.ArgumentParser(description="동기 LLM 이탈의도 라벨링")
-    p.add_argument("--csv", required=True, help="입력 CSV 경로")
+    p.add_argument("--csv", required=True, help="입력 데이터 경로 (csv/parquet/feather)")
     p.add_argument("--text-col", default="content", help="텍스트 컬럼명")
     p.add_argument("--score-col", default="score", help="별점 컬럼명")
-    p.add_argument("--out", required=True, help="저장 CSV 경로")
+    p.add_argument("--out", required=True, help="저장 경로")
+    p.add_argument("--format", default=None, choices=FORMATS, help="저장 포맷 (미입력시 --out 확장자로 판단, 기본 csv)")
     p.add_argument("--n", type=int, default=1000, help="라벨링할 샘플 수")
     p.add_argument("--batch", type=int, default=100, help="한 번에 처리할 샘플 수")
     p.add_argument("--model", default="gemini-2.0-flash", help="Gemini 모델명")
@@ -160,7 +162,7 @@ def main():
 
     args = p.parse_args()
 
-    df = pd.read_csv(args.csv)
+    df = read_table(args.csv)
     df = df.dropna(subset=[args.text_col, args.score_col]).copy()
     df = df.head(min(args.n, len(df))).reset_index(drop=True)
 
@@ -194,8 +196,7 @@ def main():
     if bad_mask.any():
         print(f"최종적으로도 이상치 {int(bad_mask.sum())}건 남음 (결과 그대로 저장)")
 
-    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
-    df_labeled.to_csv(args.out, index=False, encoding="utf-8-sig")
+    write_table(df_labeled, args.out, args.format)
 
     end_time = time.time()
     print(f"소요 시간: {time.strftime('%H:%M:%S', time.gmtime(end_time - start_time))}")
@@ -1,20 +1,33 @@
 import re
 import argparse
 import json
-import os
 import asyncio
 import time
 from typing import Any, List, Dict
 
 import pandas as pd
-from google import genai  # pip install -U google-genai
+
+from src.data_io import FORMATS, read_table, write_table
+from src.llm_memo import LLMMemo, memo_key, prompt_version, split_misses
+from src.llm_limiter import AdaptiveLimiter
+from src.llm_client import add_client_args, client_from_args, LazyClient, resolve_client
+from src.llm_batch import salvage_batch, estimate_tokens, pack_batches, describe_batches
+
+
+TEMPERATURE = 0.0
+VALID = ["확정", "불만", "없음"]
+REQUEST_TIMEOUT = 120  # 요청 1회 제한 시간(초), 초과 시 혼잡으로 보고 동시성 축소
 
 
 # --- 1. 프롬프트 생성 ---
 
+def format_item(i: int, text: str, rating: int) -> str:
+    return f"ID_{i+1}: (별점 {rating}점) {text}"
+
+
 def build_batch_prompt(texts: List[str], ratings: List[int]) -> str:
     combined_inputs = "\n".join([
-        f"ID_{i+1}: (별점 {r}점) {t}" for i, (r, t) in enumerate(zip(ratings, texts))
+        format_item(i, t, r) for i, (r, t) in enumerate(zip(ratings, texts))
     ])
 
     return f"""
@@ -53,6 +66,16 @@ def build_batch_prompt(texts: List[str], ratings: List[int]) -> str:
 """.strip()
 
 
+# 프롬프트/설정이 바뀌면 메모 키가 바뀜
+PROMPT_VERSION = prompt_version(build_batch_prompt(["{text}"], [0]), temperature=TEMPERATURE)
+
+# 배치 구성용 토큰 추정 (고정 지시문, 리뷰 1개당 예상 출력)
+BASE_TOKENS = estimate_tokens(build_batch_prompt([], []))
+OUTPUT_TOKENS_PER_ITEM = 80  # churn_intent_reason 문장 포함
+MAX_INPUT_TOKENS = 12000
+MAX_OUTPUT_TOKENS = 6000  # 모델 출력 한도(8192)보다 여유있게
+
+
 # --- 2. json 내 데이터 추출 ---
 
 def extract_json(s: str) -> Any:
@@ -79,79 +102,102 @@ def extract_json(s: str) -> Any:
 
 # --- 3. 비동기 처리 ---
 
-async def process_batch(client, model, batch_texts, batch_ratings, batch_index, semaphore) -> List[Dict[str, Any]]:
-    async with semaphore:  # 동시 요청 수 제한
-        prompt = build_batch_prompt(batch_texts, batch_ratings)
-
-        for attempt in range(3):  # 재시도 로직
-            try:
-                resp = await asyncio.to_thread(
-                    client.models.generate_content,
+def accept_label(item):
+    # churn_intent가 VALID 밖이면 형식 오류로 보고 재요청
+    if item.get("churn_intent") not in VALID:
+        return None
+    return {
+        "churn_intent": item["churn_intent"],
+        "churn_intent_label": item.get("churn_intent_label", -1),
+        "churn_intent_reason": item.get("churn_intent_reason", "")
+    }
+
+
+# client.aio(네이티브 async)로 호출: to_thread는 기본 스레드풀 크기에 묶여 동시성을 늘릴 수 없음
+async def process_batch(client, model, batch_texts, batch_ratings, batch_index, limiter: AdaptiveLimiter, timeout: float = REQUEST_TIMEOUT) -> List[Dict[str, Any]]:
+    async def request(rows):
+        # 요청 1회만 슬롯 점유 (재시도 대기 중에는 다른 배치가 슬롯 사용)
+        async with limiter.slot():
+            resp = await asyncio.wait_for(
+                client.aio.models.generate_content(
                     model=model,
-                    contents=prompt,
-                    config={"temperature": 0.0},
-                )
+                    contents=build_batch_prompt([batch_texts[r] for r in rows], [batch_ratings[r] for r in rows]),
+                    config={"temperature": TEMPERATURE},
+                ),
+                timeout,
+            )
+        return resp.text
+
+    # ID_n 기준으로 정상 항목은 받고 누락/이상치 항목만 재요청
+    result = await salvage_batch(request, len(batch_texts), extract_json, accept_label, batch_index, limiter)
+
+    failed = sum(r is None for r in result)
+    if failed:
+        print(f"배치 {batch_index} : {failed}개 최종 실패")
+    else:
+        print(f"배치 {batch_index} 완료 ({limiter.status()})")
+    return [r or {"churn_intent": "Error", "churn_intent_label": -1, "churn_intent_reason": "Error"} for r in result]
 
-                data = extract_json(resp.text)
-                if isinstance(data, list) and len(data) == len(batch_texts):
-                    print(f"배치 {batch_index} 완료")
-                    out = []
-                    for item in data:
-                        out.append(
-                            {
-                                "churn_intent": item.get("churn_intent", ""),
-                                "churn_intent_label": item.get("churn_intent_label", -1),
-                                "churn_intent_reason": item.get("churn_intent_reason", "")
-                            }
-                        )
-                    return out
-
-            except Exception as e:
-                print(f"배치 {batch_index} 시도 {attempt+1} 실패: {e}")
-                await asyncio.sleep(2 ** attempt)  # 지수 백오프
-
-        print(f"배치 {batch_index} 최종 실패")
-        return [{"churn_intent": "Error", "churn_intent_label": -1, "churn_intent_reason": "Error"} for _ in batch_texts]
-
-
-async def label_subset_async(df_sub: pd.DataFrame, client, args) -> pd.DataFrame:
+
+# limiter: 재라벨링 반복에서도 조정된 동시성을 이어서 쓰도록 main에서 하나만 만들어 전달
+async def label_subset_async(df_sub: pd.DataFrame, client, args, limiter: AdaptiveLimiter | None = None) -> pd.DataFrame:
     if df_sub.empty:
         return df_sub.copy()
 
-    semaphore = asyncio.Semaphore(args.parallel)
-    tasks = []
-
-    # 배치별로 입력 준비
-    for i in range(0, len(df_sub), args.batch):
-        batch_slice = df_sub.iloc[i: i + args.batch]
-        batch_texts = batch_slice[args.text_col].astype(str).tolist()
-        batch_ratings = batch_slice[args.score_col].astype(int).tolist()
-
-        tasks.append(
-            process_batch(
-                client=client,
-                model=args.model,
-                batch_texts=batch_texts,
-                batch_ratings=batch_ratings,
-                batch_index=i // args.batch + 1,
-                semaphore=semaphore,
+    texts = df_sub[args.text_col].astype(str).tolist()
+    ratings = df_sub[args.score_col].astype(int).tolist()
+
+    memo_db = getattr(args, "memo_db", None)
+    memo = LLMMemo(memo_db) if memo_db else None
+    keys = [memo_key(t, r) for t, r in zip(texts, ratings)]
+    found = memo.get_many(set(keys), PROMPT_VERSION, args.model) if memo else {}
+
+    # 메모에 없는 리뷰(내용 기준 중복 제거)만 다시 묶음
+    miss_rows = split_misses(keys, found)
+    if memo:
+        print(f"라벨 메모 : {len(texts) - sum(k not in found for k in keys)}개 적중 / 신규 요청 {len(miss_rows)}개")
+
+    # 최대 args.batch개, 입력/출력 토큰 예산 안에서 채움
+    batches = pack_batches(
+        [format_item(i, texts[r], ratings[r]) for i, r in enumerate(miss_rows)], BASE_TOKENS, args.batch,
+        getattr(args, "max_input_tokens", MAX_INPUT_TOKENS), getattr(args, "max_output_tokens", MAX_OUTPUT_TOKENS), OUTPUT_TOKENS_PER_ITEM,
+    )
+    batches = [[miss_rows[j] for j in b] for b in batches]
+    print(describe_batches(batches))
+
+    if limiter is None:
+        limiter = AdaptiveLimiter(initial=args.parallel, max_limit=getattr(args, "max_parallel", None) or args.parallel * 4)
+    results = []
+
+    if batches: # 전부 메모 적중이면 클라이언트를 만들지 않음
+        client = resolve_client(client) # 생성 함수(LazyClient)면 여기서 생성
+        tasks = []
+
+        # 배치별로 입력 준비
+        for i, batch_rows in enumerate(batches):
+            tasks.append(
+                process_batch(
+                    client=client,
+                    model=args.model,
+                    batch_texts=[texts[r] for r in batch_rows],
+                    batch_ratings=[ratings[r] for r in batch_rows],
+                    batch_index=i + 1,
+                    limiter=limiter,
+                )
             )
-        )
 
-    results = await asyncio.gather(*tasks)
+        results = await asyncio.gather(*tasks)
 
-    # 결과를 df_sub 순서대로 펼쳐서 컬럼으로 붙이기
-    out_churn_intent, out_churn_intent_label, out_churn_intent_reason = [], [], []
-    for batch in results:
-        for item in batch:
-            out_churn_intent.append(item["churn_intent"])
-            out_churn_intent_label.append(item["churn_intent_label"])
-            out_churn_intent_reason.append(item["churn_intent_reason"])
+    # 정상 라벨만 메모에 저장 (이상치/실패는 다음 실행이나 재라벨링에서 다시 요청)
+    new = {keys[r]: item for rows, result in zip(batches, results) for r, item in zip(rows, result)}
+    if memo:
+        memo.put_many({k: v for k, v in new.items() if v["churn_intent"] in VALID}, PROMPT_VERSION, args.model)
+    found.update(new)
 
+    # 결과를 df_sub 순서대로 컬럼으로 붙이기
     df_sub = df_sub.copy()
-    df_sub["churn_intent"] = out_churn_intent
-    df_sub["churn_intent_label"] = out_churn_intent_label
-    df_sub["churn_intent_reason"] = out_churn_intent_reason
+    for col in ["churn_intent", "churn_intent_label", "churn_intent_reason"]:
+        df_sub[col] = [found[k][col] for k in keys]
     return df_sub
 
 
@@ -159,35 +205,40 @@ async def label_subset_async(df_sub: pd.DataFrame, client, args) -> pd.DataFrame
 
 async def main_async():
     p = argparse.ArgumentParser(description="비동기 LLM 이탈의도 라벨링")
-    p.add_argument("--csv", required=True, help="입력 CSV 경로")
+    p.add_argument("--csv", required=True, help="입력 데이터 경로 (csv/parquet/feather)")
     p.add_argument("--text-col", default="content", help="텍스트 컬럼명")
     p.add_argument("--score-col", default="score", help="별점 컬럼명")
-    p.add_argument("--out", required=True, help="저장 CSV 경로")
+    p.add_argument("--out", required=True, help="저장 경로")
+    p.add_argument("--format", default=None, choices=FORMATS, help="저장 포맷 (미입력시 --out 확장자로 판단, 기본 csv)")
     p.add_argument("--n", type=int, default=1000, help="라벨링할 샘플 수")
-    p.add_argument("--batch", type=int, default=100, help="한 번에 처리할 샘플 수")
-    p.add_argument("--parallel", type=int, default=10, help="동시 실행 배치 수")
+    p.add_argument("--batch", type=int, default=100, help="한 번에 처리할 최대 샘플 수 (0: 토큰 예산으로만 구성)")
+    p.add_argument("--max-input-tokens", type=int, default=MAX_INPUT_TOKENS, help="요청당 입력 토큰 예산 (추정치, 0: 제한 없음)")
+    p.add_argument("--max-output-tokens", type=int, default=MAX_OUTPUT_TOKENS, help="요청당 출력 토큰 예산 (추정치, 0: 제한 없음)")
+    p.add_argument("--parallel", type=int, default=10, help="시작 동시 실행 배치 수")
+    p.add_argument("--max-parallel", type=int, default=None, help="동시 실행 배치 수 상한 (기본: --parallel x 4, 429/5xx 발생 시 자동 축소)")
     p.add_argument("--model", default="gemini-2.0-flash", help="Gemini 모델명")
+    p.add_argument("--memo-db", default=None, help="리뷰별 결과 메모 SQLite 경로 (같은 리뷰/프롬프트/모델은 재요청 생략)")
     p.add_argument("--rerun-max", type=int, default=2,
                    help="라벨링 후 churn_intent가 ['확정','불만','없음']에 없는 행만 재라벨링 반복 횟수")
+    add_client_args(p)
 
     args = p.parse_args()
 
     # 데이터 로드
-    df = pd.read_csv(args.csv)
+    df = read_table(args.csv)
     df = df.dropna(subset=[args.text_col, args.score_col]).copy()
     df = df.head(min(args.n, len(df))).reset_index(drop=True)
 
-    client = genai.Client()  # $env:GEMINI_API_KEY='AIzaSy어쩌구'
+    client = LazyClient(lambda: client_from_args(args))  # 보낼 요청이 있을 때만 생성, live/record: $env:GEMINI_API_KEY='AIzaSy어쩌구'
+    limiter = AdaptiveLimiter(initial=args.parallel, max_limit=args.max_parallel or args.parallel * 4)
 
     start_time = time.time()
-    print(f"총 {len(df)}개 데이터를 {args.batch}개씩 비동기 처리 시작")
+    print(f"총 {len(df)}개 데이터를 최대 {args.batch}개씩 비동기 처리 시작")
 
     # 1차 라벨링(전체)
-    df_labeled = await label_subset_async(df, client, args)
+    df_labeled = await label_subset_async(df, client, args, limiter)
 
     # 라벨 이상치 행만 재라벨링 반복
-    VALID = ["확정", "불만", "없음"]
-
     for rerun in range(1, args.rerun_max + 1):
         bad_mask = ~df_labeled["churn_intent"].isin(VALID)
         bad_cnt = int(bad_mask.sum())
@@ -199,21 +250,24 @@ async def main_async():
         df_bad = df_labeled.loc[bad_mask].copy()
 
         # 이상치만 다시 라벨링
-        df_bad_labeled = await label_subset_async(df_bad, client, args)
+        df_bad_labeled = await label_subset_async(df_bad, client, args, limiter)
 
         # 원본에 덮어쓰기 (인덱스 기준)
         df_labeled.loc[df_bad_labeled.index, "churn_intent"] = df_bad_labeled["churn_intent"]
         df_labeled.loc[df_bad_labeled.index, "churn_intent_label"] = df_bad_labeled["churn_intent_label"]
         df_labeled.loc[df_bad_labeled.index, "churn_intent_reason"] = df_bad_labeled["churn_intent_reason"]
 
+    print(limiter.summary())
+    if hasattr(client.client, "summary"):  # mock
+        print(client.client.summary())
+
     # 최종 남은 이상치 로그
     bad_mask = ~df_labeled["churn_intent"].isin(VALID)
     if bad_mask.any():
         print(f"최종적으로도 이상치 {int(bad_mask.sum())}건 남음 (결과 그대로 저장)")
 
     # 저장
-    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
-    df_labeled.to_csv(args.out, index=False, encoding="utf-8-sig")
+    write_table(df_labeled, args.out, args.format)
 
     end_time = time.time()
     print(f"소요 시간: {time.strftime('%H:%M:%S', time.gmtime(end_time - start_time))}")
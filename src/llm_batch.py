@@ -0,0 +1,146 @@
+import re
+import asyncio
+
+
+HANGUL = re.compile(r"[가-힣ㄱ-ㅎㅏ-ㅣ]")
+HANGUL_TOKENS = 1.0 # 한글 1자당 토큰 (Gemini 기준 보수적으로 잡음)
+CHARS_PER_TOKEN = 4 # 그 외 문자(영문/숫자/공백/기호)
+
+
+# --- 1. ID 기준 결과 매칭 ---
+
+def item_id(item) -> int | None:
+    # "id": 3 / "3" / "ID_3" 모두 허용
+    if not isinstance(item, dict):
+        return None
+    m = re.search(r"\d+", str(item.get("id", "")))
+    return int(m.group()) if m else None
+
+
+def match_ids(data, n: int, accept) -> dict:
+    """
+    LLM 응답 리스트 -> {배치 내 위치(0부터): 값}
+    - 프롬프트의 ID_1..ID_n 기준으로 매칭, accept(item)이 None이면 (형식 오류 등) 제외
+    - id가 하나도 없고 개수만 맞으면 순서대로 매칭
+    """
+    if not isinstance(data, list):
+        return {}
+
+    ids = [item_id(item) for item in data]
+    if all(i is None for i in ids) and len(data) == n:
+        ids = list(range(1, n + 1))
+
+    out = {}
+    for i, item in zip(ids, data):
+        if i is None or not 1 <= i <= n or (i - 1) in out: # 범위 밖/중복 id는 버림
+            continue
+        value = accept(item)
+        if value is not None:
+            out[i - 1] = value
+    return out
+
+
+# --- 2. 부분 수락 + 분할 재요청 ---
+
+async def salvage_batch(request, n: int, parse, accept, batch_index, limiter, attempts: int = 3, split_after: int = 2,
+                        budget_factor: float = 2.0) -> list:
+    """
+    배치 결과 중 정상 항목은 받고, 누락/오류 ID만 다시 요청
+    - request(rows): 배치 내 위치 rows로 프롬프트를 새로 만들어 요청 후 응답 텍스트 리턴 (ID는 1부터 다시 매김)
+    - parse(text): 응답 텍스트 -> JSON, accept(item): 항목 -> 값 (형식 오류면 None)
+    - 정상 항목이 하나도 없는 응답이 split_after번 이어지면 남은 행을 반으로 나눠 각각 요청
+      (나뉜 쪽은 실패 횟수를 이어받아 한 번 더 실패하면 바로 다시 나눔)
+    - 정상 항목이 없는 응답 / API 오류(429/5xx 등) 뒤에는 백오프 후 재요청, API 오류는 분할하지 않음
+    - 배치 전체 요청 수는 max(attempts, n x budget_factor)개까지 (항상 실패하는 프롬프트가 요청을 무한정 늘리지 않도록)
+    - 리턴: 위치별 값 리스트 (끝내 실패한 행은 None)
+    """
+    results = [None] * n
+    budget = max(attempts, int(n * budget_factor))
+    sent = 0
+
+    async def run(rows, label, misses=0):
+        nonlocal sent
+        errors = 0
+        while rows:
+            if sent >= budget:
+                print(f"배치 {label} : 요청 한도({budget}회) 도달, {len(rows)}개 실패 처리")
+                return
+            sent += 1
+            try:
+                text = await request(rows)
+            except Exception as e:
+                errors += 1
+                print(f"배치 {label} 요청 실패 ({errors}/{attempts}): {type(e).__name__} {e}")
+                if errors >= attempts:
+                    return
+                await asyncio.sleep(limiter.backoff(errors - 1)) # retry-after 또는 지수 백오프(jitter)
+                continue
+
+            try:
+                got = match_ids(parse(text), len(rows), accept)
+            except ValueError: # JSON 파싱 실패
+                got = {}
+            for j, value in got.items():
+                results[rows[j]] = value
+
+            missing = [r for j, r in enumerate(rows) if j not in got]
+            if missing:
+                print(f"배치 {label} : {len(got)}/{len(rows)}개 수락, {len(missing)}개 재요청")
+            rows = missing
+            if got:
+                misses = 0
+                continue
+
+            misses += 1
+            if len(rows) > 1 and misses >= split_after:
+                await asyncio.sleep(limiter.backoff(misses - 1))
+                half = len(rows) // 2
+                await asyncio.gather(run(rows[:half], f"{label}a", misses), run(rows[half:], f"{label}b", misses))
+                return
+            if misses >= attempts:
+                return
+            await asyncio.sleep(limiter.backoff(misses - 1))
+
+    await run(list(range(n)), str(batch_index))
+    return results
+
+
+# --- 3. 토큰 예산 기준 배치 구성 ---
+
+def estimate_tokens(text: str) -> int:
+    # 토크나이저 없이 쓰는 근사치 (API 호출 없이 배치 구성용)
+    hangul = len(HANGUL.findall(text))
+    return int(hangul * HANGUL_TOKENS + (len(text) - hangul) / CHARS_PER_TOKEN) + 1
+
+
+def pack_batches(lines, base_tokens: int, max_items: int, max_input_tokens: int = 0, max_output_tokens: int = 0, output_per_item: int = 0) -> list:
+    """
+    프롬프트에 들어갈 항목(lines)을 순서대로 요청 단위로 묶어서 위치 리스트들로 리턴
+    - 요청당 최대 max_items개
+    - 입력: 고정 지시문(base_tokens) + 항목 토큰 합 <= max_input_tokens
+    - 출력: 항목 수 x output_per_item <= max_output_tokens (응답이 잘려 개수 불일치가 나지 않도록)
+    - max_items/예산이 0 이하면 해당 제한 없음, 혼자서 예산을 넘는 긴 리뷰는 단독 요청
+    """
+    if max_items <= 0:
+        max_items = len(lines) or 1
+    if max_output_tokens > 0 and output_per_item:
+        max_items = max(1, min(max_items, max_output_tokens // output_per_item))
+
+    batches, cur, used = [], [], base_tokens
+    for i, line in enumerate(lines):
+        t = estimate_tokens(line) + 1 # 줄바꿈
+        if cur and (len(cur) >= max_items or (max_input_tokens > 0 and used + t > max_input_tokens)):
+            batches.append(cur)
+            cur, used = [], base_tokens
+        cur.append(i)
+        used += t
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+def describe_batches(batches) -> str:
+    sizes = [len(b) for b in batches]
+    if not sizes:
+        return "배치 구성 : 0개 요청"
+    return f"배치 구성 : {len(sizes)}개 요청 (요청당 {min(sizes)}~{max(sizes)}개, 평균 {sum(sizes) / len(sizes):.1f}개)"
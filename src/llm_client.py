@@ -0,0 +1,317 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from datetime import datetime
+
+
+MODES = ["live", "record", "replay", "mock"]
+DEFAULT_CASSETTE = "llm_cassette.jsonl"
+
+# mock 기본 설정 (--mock "latency=0.5,max_concurrent=8,..." 으로 일부만 변경)
+MOCK_DEFAULTS = {
+    "latency": 0.5,        # 요청당 기본 지연(초)
+    "per_item": 0.01,      # 리뷰 1개당 추가 지연(초)
+    "jitter": 0.2,         # 지연 변동 비율 (+-)
+    "max_concurrent": 8,   # 동시 요청이 이보다 많으면 429
+    "rps": 0.0,            # 초당 요청 한도 (0: 제한 없음), 넘으면 429
+    "retry_after": 1.0,    # 429 응답의 retryDelay(초)
+    "error_rate": 0.0,     # 503 확률
+    "malformed_rate": 0.0, # JSON이 아닌 응답 확률
+    "drop_rate": 0.0,      # 배치 응답에서 항목 하나씩 누락될 확률
+    "seed": 0,
+}
+
+
+# --- 1. 공통 ---
+
+class LLMResponse:
+    # genai 응답 중 파이프라인이 쓰는 부분(text)만
+    def __init__(self, text: str):
+        self.text = text
+
+
+class MockAPIError(Exception):
+    # google.genai.errors.APIError처럼 code 속성을 가짐 (llm_limiter.classify_error 호환)
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class CassetteMiss(KeyError):
+    pass
+
+
+def request_key(model: str, contents, config=None) -> str:
+    s = json.dumps([model, contents, config or {}], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+
+class _Models:
+    # client.models / client.aio.models 형태로 감싸기 위한 어댑터
+    def __init__(self, fn):
+        self.generate_content = fn
+
+
+class _Aio:
+    # `async with client.aio as c` 와 `client.aio.models` 둘 다 지원
+    def __init__(self, fn, inner=None):
+        self.models = _Models(fn)
+        self._inner = inner
+
+    async def __aenter__(self):
+        if self._inner is not None and hasattr(self._inner, "__aenter__"):
+            await self._inner.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._inner is not None and hasattr(self._inner, "__aexit__"):
+            return await self._inner.__aexit__(*exc)
+        return False
+
+
+# --- 2. record / replay ---
+
+class Cassette:
+    """
+    요청(model, contents, config) 해시 -> 응답 텍스트를 JSONL로 저장
+    - 같은 요청이 여러 번 기록됐으면 기록된 순서대로 재생 (마지막 응답은 반복)
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self._served = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        e = json.loads(line)
+                        self.entries.setdefault(e["key"], []).append(e["text"])
+
+    def append(self, key: str, model: str, text: str):
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, "model": model, "text": text, "recorded_at": datetime.now().isoformat(timespec="seconds")}, ensure_ascii=False) + "\n")
+        self.entries.setdefault(key, []).append(text)
+
+    def play(self, key: str) -> str:
+        texts = self.entries.get(key)
+        if not texts:
+            raise CassetteMiss(f"카세트에 없는 요청입니다: {key} ({self.path}, record 모드로 먼저 기록 필요)")
+        i = self._served.get(key, 0)
+        self._served[key] = i + 1
+        return texts[min(i, len(texts) - 1)]
+
+
+class RecordingClient:
+    # 실제 genai 클라이언트 응답을 그대로 돌려주면서 카세트에 기록 (실패한 요청은 기록하지 않음)
+    def __init__(self, inner, cassette: Cassette):
+        self.cassette = cassette
+
+        def generate(model, contents, config=None):
+            resp = inner.models.generate_content(model=model, contents=contents, config=config)
+            cassette.append(request_key(model, contents, config), model, resp.text)
+            return resp
+
+        async def agenerate(model, contents, config=None):
+            resp = await inner.aio.models.generate_content(model=model, contents=contents, config=config)
+            cassette.append(request_key(model, contents, config), model, resp.text)
+            return resp
+
+        self.models = _Models(generate)
+        self.aio = _Aio(agenerate, inner.aio)
+
+
+class ReplayClient:
+    # 네트워크 없이 카세트 응답만 재생 (결정적)
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+        def generate(model, contents, config=None):
+            return LLMResponse(cassette.play(request_key(model, contents, config)))
+
+        async def agenerate(model, contents, config=None):
+            return generate(model, contents, config)
+
+        self.models = _Models(generate)
+        self.aio = _Aio(agenerate)
+
+
+# --- 3. mock 서버 ---
+
+def parse_mock_spec(spec: str | None) -> dict:
+    # "latency=0.2,max_concurrent=4" -> MOCK_DEFAULTS 덮어쓰기
+    cfg = dict(MOCK_DEFAULTS)
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        k, v = part.split("=", 1)
+        k = k.strip()
+        if k not in cfg:
+            raise ValueError(f"알 수 없는 mock 설정: {k} (가능: {', '.join(cfg)})")
+        cfg[k] = type(cfg[k])(float(v))
+    return cfg
+
+
+def mock_answer(contents: str, rng: random.Random, drop_rate: float = 0.0) -> str:
+    """
+    프롬프트 종류별로 형식에 맞는 가짜 응답 생성
+    - 키워드/이탈의도: ID_n 줄마다 항목 1개 (drop_rate 확률로 누락)
+    - 리뷰 요약: situations/evaluations/solutions + reason_id
+    """
+    if "[Review List]" in contents: # llm_summary_reviews
+        ids = re.findall(r"^id=(.*?) :: ", contents, re.M)
+        item = lambda s: [{"text": f"{s} {i + 1}", "importance": 5 - i} for i in range(2)]
+        return json.dumps({"situations": item("상황"), "evaluations": item("평가"), "solutions": item("대응"), "reason_id": ids[:20]}, ensure_ascii=False)
+
+    items = []
+    for i, rating, text in re.findall(r"^ID_(\d+): (?:\(별점 (\d)점\) )?(.*)$", contents, re.M):
+        if rng.random() < drop_rate:
+            continue
+        if "churn_intent" in contents:
+            label = 2 if any(w in text for w in ("삭제", "탈퇴")) else 1 if rating and int(rating) <= 3 else 0
+            items.append({"id": int(i), "churn_intent": ["없음", "불만", "확정"][label], "churn_intent_label": label, "churn_intent_reason": f"mock {label}"})
+        else:
+            items.append({"id": int(i), "keywords": ["앱-불만" if len(text) % 2 else "배달-지연"]})
+    return json.dumps(items, ensure_ascii=False)
+
+
+class MockClient:
+    """
+    로컬 mock Gemini (네트워크 없음)
+    - 지연: latency + per_item x 리뷰 수 (+-jitter)
+    - 동시 요청 max_concurrent 초과 / 초당 rps 초과 시 429 (retryDelay 포함)
+    - error_rate 확률로 503, malformed_rate 확률로 JSON 아닌 응답, drop_rate로 항목 누락
+    - stats / summary(): 요청/429/503/malformed 횟수, 최대 동시 요청 수
+    """
+    def __init__(self, **config):
+        self.cfg = {**MOCK_DEFAULTS, **config}
+        self.rng = random.Random(self.cfg["seed"])
+        self.inflight = 0
+        self.stats = {"requests": 0, "rate_limit": 0, "server": 0, "malformed": 0, "peak_concurrent": 0}
+        self._recent = []
+        self._lock = threading.Lock()
+
+        def generate(model, contents, config=None):
+            delay = self._enter(contents)
+            try:
+                time.sleep(delay)
+                return self._respond(contents)
+            finally:
+                self._exit()
+
+        async def agenerate(model, contents, config=None):
+            delay = self._enter(contents)
+            try:
+                await asyncio.sleep(delay)
+                return self._respond(contents)
+            finally:
+                self._exit()
+
+        self.models = _Models(generate)
+        self.aio = _Aio(agenerate)
+
+    def _enter(self, contents: str) -> float:
+        cfg = self.cfg
+        with self._lock:
+            now = time.monotonic()
+            self.stats["requests"] += 1
+            self._recent = [t for t in self._recent if now - t < 1.0]
+
+            if self.inflight >= cfg["max_concurrent"] or (cfg["rps"] and len(self._recent) >= cfg["rps"]):
+                self.stats["rate_limit"] += 1
+                raise MockAPIError(429, f"RESOURCE_EXHAUSTED (mock) retryDelay: '{cfg['retry_after']}s'")
+            if self.rng.random() < cfg["error_rate"]:
+                self.stats["server"] += 1
+                raise MockAPIError(503, "UNAVAILABLE (mock)")
+
+            self._recent.append(now)
+            self.inflight += 1
+            self.stats["peak_concurrent"] = max(self.stats["peak_concurrent"], self.inflight)
+            n = len(re.findall(r"^(?:ID_\d+|id=.*?) ", contents, re.M))
+            return (cfg["latency"] + cfg["per_item"] * n) * (1 + self.rng.uniform(-cfg["jitter"], cfg["jitter"]))
+
+    def _exit(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def _respond(self, contents: str) -> LLMResponse:
+        with self._lock:
+            if self.rng.random() < self.cfg["malformed_rate"]:
+                self.stats["malformed"] += 1
+                return LLMResponse("죄송합니다. 요청을 처리할 수 없습니다.")
+            return LLMResponse(mock_answer(contents, self.rng, self.cfg["drop_rate"]))
+
+    def summary(self) -> str:
+        s = self.stats
+        return f"mock 서버 : 요청 {s['requests']} / 429 {s['rate_limit']} / 503 {s['server']} / 깨진 응답 {s['malformed']} | 최대 동시 요청 {s['peak_concurrent']}"
+
+
+# --- 4. 클라이언트 생성 ---
+
+def make_client(mode: str | None = None, cassette: str | None = None, mock: str | None = None, **client_kwargs):
+    """
+    모드별 Gemini 클라이언트 (models.generate_content / aio.models.generate_content 동일 인터페이스)
+    - live: google.genai.Client (기본)
+    - record: live + 응답을 카세트(JSONL)에 기록
+    - replay: 카세트 응답만 재생 (네트워크/API 키 불필요)
+    - mock: 로컬 mock 서버 (지연/429/503/깨진 JSON 시뮬레이션)
+    - 인자가 없으면 환경변수 LLM_MODE / LLM_CASSETTE / LLM_MOCK 사용
+    - 모드 미지정 시 mock 설정이 있으면 mock, 카세트 경로가 있으면 replay, 둘 다 없으면 live
+    - client_kwargs(api_key 등)는 live/record에서 genai.Client에만 전달, API 키가 없으면 에러
+    """
+    mock = mock or os.environ.get("LLM_MOCK")
+    cassette = cassette or os.environ.get("LLM_CASSETTE")
+    mode = mode or os.environ.get("LLM_MODE") or ("mock" if mock else "replay" if cassette else "live")
+    cassette = cassette or DEFAULT_CASSETTE
+    if mode not in MODES:
+        raise ValueError(f"지원하지 않는 LLM 모드: {mode} (가능: {', '.join(MODES)})")
+
+    if mode == "mock":
+        return MockClient(**parse_mock_spec(mock))
+    if mode == "replay":
+        return ReplayClient(Cassette(cassette))
+
+    if not (client_kwargs.get("api_key") or client_kwargs.get("vertexai") or os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")):
+        raise RuntimeError(f"{mode} 모드는 API 키가 필요합니다. 환경변수 GEMINI_API_KEY를 설정해 주세요. (PowerShell: $env:GEMINI_API_KEY='...')")
+
+    from google import genai # pip install -U google-genai (live/record에서만 필요)
+    client = genai.Client(**client_kwargs)
+    if mode == "record":
+        return RecordingClient(client, Cassette(cassette))
+    return client
+
+
+def add_client_args(p):
+    p.add_argument("--llm-mode", default=None, choices=MODES, help="LLM 호출 모드 (기본: 환경변수 LLM_MODE, 없으면 --mock/--cassette 지정 시 mock/replay, 그 외 live)")
+    p.add_argument("--cassette", default=None, help=f"record/replay 카세트 경로 (기본: {DEFAULT_CASSETTE})")
+    p.add_argument("--mock", default=None, help="mock 설정 (예: latency=0.5,max_concurrent=8,malformed_rate=0.05)")
+
+
+def client_from_args(args, **client_kwargs):
+    return make_client(getattr(args, "llm_mode", None), getattr(args, "cassette", None), getattr(args, "mock", None), **client_kwargs)
+
+
+class LazyClient:
+    # 처음 호출될 때 한 번만 클라이언트 생성 (메모 적중으로 보낼 요청이 없으면 API 키 없이도 실행 가능)
+    def __init__(self, factory):
+        self.factory = factory
+        self.client = None
+
+    def __call__(self):
+        if self.client is None:
+            self.client = self.factory()
+        return self.client
+
+
+def resolve_client(client=None):
+    # client: 클라이언트 / LazyClient 등 인자 없는 생성 함수 / None (환경변수 기준 make_client)
+    if client is None:
+        return make_client()
+    return client() if callable(client) else client
@@ -0,0 +1,160 @@
+import re
+import time
+import random
+import asyncio
+from contextlib import asynccontextmanager
+
+
+# --- 1. 오류 분류 ---
+
+RETRY_PATTERNS = [
+    re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s"), # Gemini 429 상세 (RetryInfo)
+    re.compile(r"retry[- ]after['\"]?\s*[:=]?\s*['\"]?(\d+(?:\.\d+)?)", re.I),
+]
+
+def classify_error(e: Exception):
+    """
+    예외 -> (종류, retry-after 초)
+    - rate_limit(429), server(5xx), timeout: 혼잡 신호 (동시성 축소)
+    - other: 응답 파싱 실패 등 (동시성 유지)
+    """
+    code = getattr(e, "code", None) or getattr(e, "status_code", None)
+    retry_after = None
+
+    headers = getattr(getattr(e, "response", None), "headers", None)
+    if headers is not None:
+        try:
+            retry_after = float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+    if retry_after is None:
+        for pattern in RETRY_PATTERNS:
+            m = pattern.search(str(e))
+            if m:
+                retry_after = float(m.group(1))
+                break
+
+    if isinstance(e, (asyncio.TimeoutError, TimeoutError)):
+        return "timeout", retry_after
+    if code == 429 or "RESOURCE_EXHAUSTED" in str(e):
+        return "rate_limit", retry_after
+    if isinstance(code, int) and code >= 500:
+        return "server", retry_after
+    return "other", retry_after
+
+
+# --- 2. AIMD 동시성 제어 ---
+
+class AdaptiveLimiter:
+    """
+    AIMD 방식 동시 요청 수 제어
+    - 성공: limit개 요청이 정상 지연으로 끝날 때마다 limit + 1 (지연이 기준의 latency_factor배를 넘으면 유지)
+    - 429/5xx/timeout: limit * decrease (한 번의 혼잡에 여러 번 줄지 않도록 최근 지연시간 안에는 한 번만)
+    - retry-after: 해당 시간 동안 새 요청 중단
+    - stats(): 현재 limit, in-flight, 처리량 등
+    """
+    def __init__(self, initial: int = 10, min_limit: int = 1, max_limit: int = 40, decrease: float = 0.5, latency_factor: float = 2.0):
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+
+        self.inflight = 0
+        self.paused_until = 0.0
+        self.base_latency = None # 관측한 최소 지연
+        self.ewma_latency = None
+        self._successes = 0
+        self._last_cut = 0.0
+        self._cond = asyncio.Condition()
+
+        self.started = time.monotonic()
+        self.counts = {"ok": 0, "rate_limit": 0, "server": 0, "timeout": 0, "other": 0}
+        self.peak_limit = int(self.limit)
+
+    async def acquire(self):
+        async with self._cond:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait > 0:
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self.inflight < int(self.limit):
+                    self.inflight += 1
+                    return
+                await self._cond.wait()
+
+    async def release(self):
+        async with self._cond:
+            self.inflight -= 1
+            self._cond.notify_all()
+
+    def on_success(self, latency: float):
+        self.counts["ok"] += 1
+        self.base_latency = latency if self.base_latency is None else min(self.base_latency, latency)
+        self.ewma_latency = latency if self.ewma_latency is None else 0.8 * self.ewma_latency + 0.2 * latency
+
+        self._successes += 1
+        if self._successes >= int(self.limit): # 대략 한 번의 왕복(RTT)마다 1씩 증가
+            self._successes = 0
+            if self.ewma_latency <= self.base_latency * self.latency_factor:
+                self.limit = min(self.max_limit, self.limit + 1)
+                self.peak_limit = max(self.peak_limit, int(self.limit))
+
+    def on_failure(self, kind: str, retry_after: float | None = None):
+        self.counts[kind] += 1
+        now = time.monotonic()
+
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+
+        if kind in ("rate_limit", "server", "timeout"):
+            window = self.ewma_latency or 1.0
+            if now - self._last_cut > window:
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+                self._last_cut = now
+            self._successes = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        # 슬롯을 잡고 요청 1회 실행, 결과(성공/실패 종류)를 자동 기록
+        await self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.on_failure(*classify_error(e))
+            raise
+        else:
+            self.on_success(time.monotonic() - start)
+        finally:
+            await self.release()
+
+    def backoff(self, attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+        # 지수 백오프 + full jitter (retry-after로 멈춘 경우 남은 시간만큼은 대기)
+        return max(random.uniform(0, min(cap, base * 2 ** attempt)), self.paused_until - time.monotonic())
+
+    def stats(self) -> dict:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "limit": int(self.limit),
+            "peak_limit": self.peak_limit,
+            "inflight": self.inflight,
+            "throughput": self.counts["ok"] / elapsed, # 성공 요청/초
+            "latency": self.ewma_latency,
+            **self.counts,
+        }
+
+    def status(self) -> str:
+        s = self.stats()
+        return f"limit={s['limit']} in-flight={s['inflight']} {s['throughput']:.2f}req/s"
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (
+            f"동시성 제어 : 최종 limit={s['limit']} (최대 {s['peak_limit']}) | 처리량 {s['throughput']:.2f}req/s | "
+            f"성공 {s['ok']} / 429 {s['rate_limit']} / 5xx {s['server']} / timeout {s['timeout']} / 기타 {s['other']}"
+        )
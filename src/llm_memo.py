@@ -0,0 +1,90 @@
+import json
+import sqlite3
+import hashlib
+from datetime import datetime
+
+from src.text_hash import content_hash
+
+
+MEMO_TABLE = "llm_memo"
+SQLITE_MAX_VARS = 900 # IN (...) 절 하나에 넣을 최대 개수
+
+
+# 리뷰 단위 키 (공백/유니코드 정규화 후 해시, 별점 등 프롬프트에 함께 들어가는 값도 포함)
+def memo_key(text, *extra) -> str:
+    return content_hash(text, *extra)
+
+
+# 프롬프트 버전: 템플릿(+호출 설정)이 바뀌면 값이 바뀌어 이전 결과를 쓰지 않음
+def prompt_version(template: str, **config) -> str:
+    s = template + json.dumps(config, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()[:16]
+
+
+class LLMMemo:
+    # (content_hash, prompt_version, model) -> LLM 결과(JSON) 저장
+    def __init__(self, db_path: str, table: str = MEMO_TABLE):
+        self.db_path = db_path
+        self.table = table
+
+        conn = sqlite3.connect(db_path)
+        try:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    content_hash TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    PRIMARY KEY (content_hash, prompt_version, model)
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_many(self, keys, version: str, model: str) -> dict:
+        keys = list(keys)
+        found = {}
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for i in range(0, len(keys), SQLITE_MAX_VARS):
+                chunk = keys[i:i + SQLITE_MAX_VARS]
+                placeholders = ",".join(["?"] * len(chunk))
+                rows = conn.execute(
+                    f"SELECT content_hash, result FROM {self.table} WHERE prompt_version = ? AND model = ? AND content_hash IN ({placeholders})",
+                    (version, model, *chunk),
+                ).fetchall()
+                for h, result in rows:
+                    found[h] = json.loads(result)
+        finally:
+            conn.close()
+        return found
+
+    def put_many(self, items: dict, version: str, model: str):
+        now = datetime.now().isoformat(timespec="seconds")
+        rows = [(h, version, model, json.dumps(r, ensure_ascii=False), now) for h, r in items.items()]
+        if not rows:
+            return
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.executemany(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?, ?)", rows)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def split_misses(keys, found: dict) -> list:
+    """
+    메모에 없는 키의 첫 등장 행 번호 리스트 (같은 내용은 한 번만 요청)
+    - 이 행들만 다시 batch 크기로 묶어서 요청하면 모든 요청이 꽉 찬 배치가 됨
+    """
+    seen = set()
+    rows = []
+    for i, k in enumerate(keys):
+        if k not in found and k not in seen:
+            seen.add(k)
+            rows.append(i)
+    return rows
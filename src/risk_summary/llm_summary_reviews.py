@@ -1,9 +1,8 @@
-import os
 import json
 import time
 import argparse
 import pandas as pd
-from google import genai
+from src.llm_client import make_client, add_client_args, client_from_args
 from typing import Tuple, List
 from collections import Counter
 
@@ -151,12 +150,10 @@ def build_batch_prompt(reviews: dict, keyword: str) -> str:
 """.strip()
 
 
-def llm_summary_reviews(reviews: dict, keyword: str, model: str = "gemini-2.0-flash") -> dict:
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError("환경변수 GEMINI_API_KEY를 설정해 주세요. (PowerShell: $env:GEMINI_API_KEY='...')")
+# client 미지정 시 환경변수 LLM_MODE 기준 (live/record는 GEMINI_API_KEY 필요, replay/mock은 네트워크 없이 실행)
+def llm_summary_reviews(reviews: dict, keyword: str, model: str = "gemini-2.0-flash", client=None) -> dict:
+    client = client or make_client()
 
-    client = genai.Client(api_key=api_key)
     prompt = build_batch_prompt(reviews, keyword)
 
     resp = client.models.generate_content(
@@ -175,7 +172,7 @@ def llm_summary_reviews(reviews: dict, keyword: str, model: str = "gemini-2.0-fl
     return out
 
 
-def summary_pipeline(df: pd.DataFrame, model: str = "gemini-2.0-flash") -> Tuple[dict, dict, str]:
+def summary_pipeline(df: pd.DataFrame, model: str = "gemini-2.0-flash", client=None) -> Tuple[dict, dict, str]:
     df_complaint = df[df["churn_intent_label"] == 1].copy()
     df_confirmed = df[df["churn_intent_label"] == 2].copy()
 
@@ -202,8 +199,8 @@ def summary_pipeline(df: pd.DataFrame, model: str = "gemini-2.0-flash") -> Tuple
     if not review_confirmed:
         raise RuntimeError(f"확정 리뷰에서 target='{target}' 포함 리뷰가 0건입니다.")
 
-    summary_complaint = llm_summary_reviews(review_complaint, target, model)
-    summary_confirmed = llm_summary_reviews(review_confirmed, target, model)
+    summary_complaint = llm_summary_reviews(review_complaint, target, model, client)
+    summary_confirmed = llm_summary_reviews(review_confirmed, target, model, client)
 
     return summary_complaint, summary_confirmed, target
 
@@ -212,7 +209,9 @@ def main():
     p = argparse.ArgumentParser(description="동기식 LLM 리뷰요약")
     p.add_argument("--csv", required=True)
     p.add_argument("--model", default="gemini-2.0-flash")
+    add_client_args(p)
     args = p.parse_args()
+    client = client_from_args(args) # --llm-mode 미지정 시 환경변수 LLM_MODE
 
     df = pd.read_csv(args.csv)
     df["keywords"] = df["keywords"].map(str_to_list)
@@ -225,7 +224,7 @@ def main():
     print("모델:", args.model)
 
     start_time = time.time()
-    summary_complaint, summary_confirmed, keyword = summary_pipeline(df, args.model)
+    summary_complaint, summary_confirmed, keyword = summary_pipeline(df, args.model, client)
     end_time = time.time()
 
     print(f"소요 시간: {time.strftime('%H:%M:%S', time.gmtime(end_time - start_time))}")
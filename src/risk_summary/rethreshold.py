@@ -0,0 +1,100 @@
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+
+from src.classification.configs import id2label, PROB_COLS
+from src.risk_summary.risk_score_calc import monthly_risk_table
+
+
+# --- 1. 재라벨링 ---
+
+def relabel(probs, threshold: float | None = None) -> np.ndarray:
+    """
+    저장된 클래스별 확률로 라벨 재계산 (벡터 연산)
+    - threshold=None: argmax
+    - threshold 지정: 확정(2) 확률이 threshold 이상이면 2, 아니면 없음(0)/불만(1) 중 큰 쪽
+    """
+    probs = np.asarray(probs, dtype=np.float64)
+    if threshold is None:
+        return probs.argmax(axis=1)
+    return np.where(probs[:, 2] >= threshold, 2, probs[:, :2].argmax(axis=1))
+
+
+def rethreshold_df(df: pd.DataFrame, threshold: float | None = None) -> pd.DataFrame:
+    # 확률이 없는 행(확률 저장 전 데이터)은 기존 라벨 유지
+    df = df.copy()
+    has_prob = df[PROB_COLS].notna().all(axis=1).to_numpy()
+
+    labels = df["churn_intent_label"].to_numpy(dtype=np.int64, copy=True)
+    labels[has_prob] = relabel(df.loc[has_prob, PROB_COLS].to_numpy(), threshold)
+
+    df["churn_intent_label"] = labels
+    df["churn_intent"] = df["churn_intent_label"].map(id2label)
+    return df
+
+
+# --- 2. DB 조회/반영 ---
+
+def fetch_prob_df(conn, table: str = "data", start_month: str | None = None, end_month: str | None = None) -> pd.DataFrame:
+    cols = ["reviewId", "at", "churn_intent", "churn_intent_label", *PROB_COLS]
+    existing = {c[1] for c in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+    missing = [c for c in cols if c not in existing]
+    if missing:
+        raise ValueError(f"{table} 테이블에 {missing} 컬럼이 없습니다. 확률 저장 이후 분류한 데이터가 필요합니다.")
+
+    query = f"SELECT {', '.join(cols)} FROM {table} WHERE 1=1"
+    params = []
+    if start_month:
+        query += " AND substr(at, 1, 7) >= ?"
+        params.append(start_month)
+    if end_month:
+        query += " AND substr(at, 1, 7) <= ?"
+        params.append(end_month)
+    return pd.read_sql(query, conn, params=params)
+
+
+def apply_to_db(conn, df: pd.DataFrame, monthly: pd.DataFrame, data_table: str = "data", summary_table: str = "summary"):
+    conn.executemany(
+        f"UPDATE {data_table} SET churn_intent = ?, churn_intent_label = ? WHERE reviewId = ?",
+        zip(df["churn_intent"], df["churn_intent_label"].astype(int).tolist(), df["reviewId"]),
+    )
+    conn.executemany(
+        f"UPDATE {summary_table} SET risk_score = ? WHERE month = ?",
+        zip(monthly["risk_score"].tolist(), monthly["month"]),
+    )
+    conn.commit()
+
+
+def main():
+    p = argparse.ArgumentParser(description="저장된 클래스별 확률로 threshold 재조정 (재추론 없음)")
+    p.add_argument("--db-path", required=True, help="DB 경로")
+    p.add_argument("--data-table", default="data")
+    p.add_argument("--summary-table", default="summary")
+    p.add_argument("--threshold", type=float, default=None, help="확정(2) 판정 확률 threshold (미입력시 argmax)")
+    p.add_argument("--start-month", default=None, help="YYYY-MM")
+    p.add_argument("--end-month", default=None, help="YYYY-MM")
+    p.add_argument("--apply", action="store_true", help="data 라벨과 summary 이탈지수를 DB에 반영 (미지정시 비교만 출력)")
+    args = p.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        df = fetch_prob_df(conn, args.data_table, args.start_month, args.end_month)
+        new_df = rethreshold_df(df, args.threshold)
+
+        before = monthly_risk_table(df)
+        after = monthly_risk_table(new_df)
+        report = before.merge(after, on="month", suffixes=("_before", "_after"))
+        print(report[["month", "n_before", "n_confirmed_before", "n_confirmed_after", "n_complaint_before", "n_complaint_after", "risk_score_before", "risk_score_after"]].to_string(index=False))
+
+        changed = int((df["churn_intent_label"].to_numpy() != new_df["churn_intent_label"].to_numpy()).sum())
+        print(f"\n라벨 변경 : {changed}/{len(df)}개 (threshold={args.threshold})")
+
+        if args.apply:
+            apply_to_db(conn, new_df, after, args.data_table, args.summary_table)
+            print("DB 반영 완료. (summary의 요약 문구는 다시 생성되지 않음)")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,28 @@ def monthly_risk_calc(df, date_col: str='at'):
     return monthly_risk
 
 
+# 월별 이탈지수 (groupby 집계만 사용, risk_score_calc와 같은 값)
+def monthly_risk_table(df, date_col: str='at', label_col: str='churn_intent_label'):
+    month = pd.to_datetime(df[date_col], errors="coerce").dt.to_period("M").astype(str)
+    valid = month != "NaT"
+    counts = (
+        pd.crosstab(month[valid], df.loc[valid, label_col])
+        .reindex(columns=[0, 1, 2], fill_value=0)
+    )
+
+    n = counts.sum(axis=1)
+    raw = (counts[2] * 1 + counts[1] * 0.75) * (1 / (n + 60))
+
+    out = pd.DataFrame({
+        "month": counts.index,
+        "n": n.values,
+        "n_complaint": counts[1].values,
+        "n_confirmed": counts[2].values,
+        "risk_score": [round(float(x), 2) for x in raw],
+    })
+    return out.reset_index(drop=True)
+
+
 def main():
     df = pd.read_csv('data/out/baemin_reviews_playstore_99997_label_keyword.csv', encoding='utf-8-sig')
     monthly_risk = monthly_risk_calc(df)
@@ -0,0 +1,19 @@
+import re
+import hashlib
+import unicodedata
+
+import pandas as pd
+
+
+# 공백/유니코드 정규화 (같은 내용이면 같은 문자열)
+def normalize_text(text) -> str:
+    if text is None or (isinstance(text, float) and pd.isna(text)):
+        return ""
+    s = unicodedata.normalize("NFKC", str(text))
+    return re.sub(r"\s+", " ", s).strip()
+
+
+# 정규화 후 해시 (extra: 별점 등 내용과 함께 키에 넣을 값)
+def content_hash(text, *extra) -> str:
+    s = "|".join([*(str(x) for x in extra), normalize_text(text)])
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()